@@ -1,17 +1,32 @@
-import requests
+import asyncio
+import os
 import random
-import time
 import json
+import operator
+import re
+import time
 from datetime import datetime, timedelta
 import uuid
 import socket
 import ipaddress
 
+from shipper.backfill import add_backfill_arguments, backfill_range, event_times, iso_timestamp, iso_timestamps
+from shipper.cli import build_parser, make_sink
+from shipper.sinks import limit_entries
+from shipper.workers import run_workers
+
 # === CONFIG ===
 PRIVATE_KEY = "keygoeshere"
 APP_NAME = "aws-cloudtrail"
 SUBSYSTEM_NAME = "production"
 URL = "https://ingress.cx498.coralogix.com/api/v1/logs"
+# Request body: these fields plus the batch under ENTRIES_KEY
+ENVELOPE = {
+    "privateKey": PRIVATE_KEY,
+    "applicationName": APP_NAME,
+    "subsystemName": SUBSYSTEM_NAME,
+}
+ENTRIES_KEY = "logEntries"
 
 # === CONSTANTS ===
 TARGET_BYTES_PER_DAY = 1.5 * 1024 * 1024  # 1.5 MB in bytes (middle of 1-2MB range)
@@ -25,6 +40,8 @@ MIN_WAIT_SECONDS = 10
 SLEEP_JITTER_SECONDS = AVERAGE_WAIT_SECONDS * 0.5
 SLEEP_MIN_SECONDS = max(MIN_WAIT_SECONDS, AVERAGE_WAIT_SECONDS - SLEEP_JITTER_SECONDS)
 SLEEP_MAX_SECONDS = AVERAGE_WAIT_SECONDS + SLEEP_JITTER_SECONDS
+# Events generated per burst when pacing is off (--no-pace)
+UNPACED_BURST_EVENTS = 500
 
 # AWS Account and User Data
 AWS_ACCOUNT_ID = "123456789012"
@@ -48,6 +65,18 @@ EVENT_NAMES = {
     "dynamodb": ["CreateTable", "DeleteTable", "PutItem", "Query"]
 }
 
+USER_AGENTS = [
+    "aws-cli/1.29.29 Python/3.9.11 Darwin/22.6.0 botocore/1.31.29",
+    "Boto3/1.28.29 Python/3.10.12 Linux/5.15.0-1042-aws botocore/1.31.29",
+    "console.amazonaws.com",
+    "CloudFormation"
+]
+INSTANCE_TYPES = ["t2.micro", "t3.medium", "m5.large"]
+ERROR_CODES = ["AccessDenied", "UnauthorizedOperation", "ThrottlingException"]
+FAILURE_RATE = 0.1
+# Characters of the random part of principal and access key ids
+ID_CHARACTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890'
+
 # Generate some realistic source IPs
 def generate_realistic_ip():
     # AWS IP ranges or common corporate/public IPs
@@ -61,29 +90,39 @@ def generate_realistic_ip():
 
 # Generate CloudTrail event
 def generate_cloudtrail_event():
-    event_time = datetime.utcnow().isoformat() + "Z"
-    event_id = str(uuid.uuid4())
     aws_region = random.choice(AWS_REGIONS)
     service = random.choice(AWS_SERVICES)
     event_name = random.choice(EVENT_NAMES[service])
     user_arn = random.choice(AWS_USERS)
-    user_agent = random.choice([
-        "aws-cli/1.29.29 Python/3.9.11 Darwin/22.6.0 botocore/1.31.29",
-        "Boto3/1.28.29 Python/3.10.12 Linux/5.15.0-1042-aws botocore/1.31.29",
-        "console.amazonaws.com",
-        "CloudFormation"
-    ])
-    source_ip = generate_realistic_ip()
-    
+    fields = {
+        "event_time": datetime.utcnow().isoformat() + "Z",
+        "timestamp": round(time.time() * 1000, 3),
+        "event_id": str(uuid.uuid4()),
+        "request_id": str(uuid.uuid4()),
+        "principal_id": ''.join(random.choices(ID_CHARACTERS, k=16)),
+        "access_key_id": ''.join(random.choices(ID_CHARACTERS, k=16)),
+        "region": aws_region,
+        "source_ip": generate_realistic_ip(),
+        "user_agent": random.choice(USER_AGENTS),
+        "image_id": ''.join(random.choices('0123456789abcdef', k=8)),
+        "instance_type": random.choice(INSTANCE_TYPES),
+        "bucket_name": ''.join(random.choices('0123456789', k=12)),
+        # 90% success rate
+        "error_code": random.choice(ERROR_CODES) if random.random() < FAILURE_RATE else None,
+    }
+    return cloudtrail_entry(service, event_name, user_arn, fields)
+
+def cloudtrail_entry(service, event_name, user_arn, fields):
+    """Builds the log entry for one event from its per-event values (see TEMPLATE_FIELDS)."""
     # Event structure based on actual CloudTrail schema
     event = {
         "eventVersion": "1.08",
         "userIdentity": {
             "type": "IAMUser" if "user/" in user_arn else "AssumedRole",
-            "principalId": "AIDA" + ''.join(random.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890', k=16)),
+            "principalId": "AIDA" + fields["principal_id"],
             "arn": user_arn,
             "accountId": AWS_ACCOUNT_ID,
-            "accessKeyId": "AKIA" + ''.join(random.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890', k=16)),
+            "accessKeyId": "AKIA" + fields["access_key_id"],
             "sessionContext": {
                 "sessionIssuer": {
                     "type": "Role" if "assumed-role" in user_arn else "IAMUser",
@@ -91,14 +130,14 @@ def generate_cloudtrail_event():
                 }
             }
         },
-        "eventTime": event_time,
+        "eventTime": fields["event_time"],
         "eventSource": "{}.amazonaws.com".format(service),
         "eventName": event_name,
-        "awsRegion": aws_region,
-        "sourceIPAddress": source_ip,
-        "userAgent": user_agent,
-        "requestID": str(uuid.uuid4()),
-        "eventID": event_id,
+        "awsRegion": fields["region"],
+        "sourceIPAddress": fields["source_ip"],
+        "userAgent": fields["user_agent"],
+        "requestID": fields["request_id"],
+        "eventID": fields["event_id"],
         "readOnly": event_name.startswith(("Describe", "List", "Get")),
         "resources": [],
         "eventType": "AwsApiCall",
@@ -108,7 +147,7 @@ def generate_cloudtrail_event():
         "tlsDetails": {
             "tlsVersion": "TLSv1.2",
             "cipherSuite": "ECDHE-RSA-AES128-GCM-SHA256",
-            "clientProvidedHostHeader": "{}.{}.amazonaws.com".format(service, aws_region)
+            "clientProvidedHostHeader": "{}.{}.amazonaws.com".format(service, fields["region"])
         }
     }
     
@@ -118,8 +157,8 @@ def generate_cloudtrail_event():
             "instancesSet": {
                 "items": [
                     {
-                        "imageId": "ami-" + ''.join(random.choices('0123456789abcdef', k=8)),
-                        "instanceType": random.choice(["t2.micro", "t3.medium", "m5.large"]),
+                        "imageId": "ami-" + fields["image_id"],
+                        "instanceType": fields["instance_type"],
                         "minCount": 1,
                         "maxCount": 1
                     }
@@ -128,115 +167,278 @@ def generate_cloudtrail_event():
         }
     elif service == "s3" and event_name == "CreateBucket":
         event["requestParameters"] = {
-            "bucketName": "my-bucket-" + ''.join(random.choices('0123456789', k=12)),
+            "bucketName": "my-bucket-" + fields["bucket_name"],
             "x-amz-acl": "private"
         }
     
     # Add some response elements for successful events
-    if random.random() > 0.1:  # 90% success rate
+    if fields["error_code"] is None:
         event["responseElements"] = {"_return": True}
     else:
-        event["errorCode"] = random.choice(["AccessDenied", "UnauthorizedOperation", "ThrottlingException"])
+        event["errorCode"] = fields["error_code"]
         event["errorMessage"] = "User is not authorized to perform this action"
     
     return {
+        "timestamp": fields["timestamp"],  # epoch ms; without it the ingress stamps the arrival time
         "text": json.dumps(event),
         "severity": 3,  # Info level for all CloudTrail events
         "resource": {
             "application": APP_NAME,
             "subsystem": SUBSYSTEM_NAME,
             "aws_account": AWS_ACCOUNT_ID,
-            "aws_region": aws_region
+            "aws_region": fields["region"]
         },
         "attributes": {
-            "event_id": event_id,
+            "event_id": fields["event_id"],
             "event_name": event_name,
             "event_source": event["eventSource"],
             "user_arn": user_arn
         }
     }
 
+# Columns written for --output .parquet/.arrow, as built by CloudTrailEvents.columns().
+# They hold every per-event value, so cloudtrail_entry() can rebuild each event exactly.
+TABLE_SCHEMA = [
+    ("event_time", "timestamp"),
+    ("event_source", "dictionary"),
+    ("event_name", "dictionary"),
+    ("aws_region", "dictionary"),
+    ("user_arn", "dictionary"),
+    ("source_ip", "string"),
+    ("user_agent", "dictionary"),
+    ("error_code", "dictionary"),
+    ("event_id", "string"),
+    ("request_id", "string"),
+    ("principal_id", "string"),
+    ("access_key_id", "string"),
+    # Only set for RunInstances and CreateBucket, the events with request parameters.
+    ("image_id", "string"),
+    ("instance_type", "dictionary"),
+    ("bucket_name", "string"),
+]
+
+# === Template-based bulk generator ===
+# Per-event values cloudtrail_entry() reads; everything else is fixed by
+# (service, eventName, user, failed) and pre-serialized once per combination.
+TEMPLATE_FIELDS = ("event_time", "event_id", "request_id", "principal_id", "access_key_id", "region",
+                   "source_ip", "user_agent", "image_id", "instance_type", "bucket_name", "error_code",
+                   "timestamp")
+# Fields written as JSON numbers, so their placeholders lose the quotes.
+NUMERIC_TEMPLATE_FIELDS = ("timestamp",)
+# (service, eventName) pairs weighted so services stay equally likely, as in generate_cloudtrail_event().
+EVENT_KINDS = [(service, name) for service in AWS_SERVICES for name in EVENT_NAMES[service]]
+EVENT_KIND_WEIGHTS = [1 / len(EVENT_NAMES[service]) for service, _ in EVENT_KINDS]
+
+# Byte -> character tables for turning os.urandom output into id strings.
+ID_CHARACTER_TABLE = bytes(ord(ID_CHARACTERS[i % len(ID_CHARACTERS)]) for i in range(256))
+DIGIT_TABLE = bytes(ord('0123456789'[i % 10]) for i in range(256))
+# Layout of a UUID string: 32 hex digits with dashes in the 8-4-4-4-12 positions.
+UUID_LENGTH = 36
+UUID_DASH_POSITIONS = (8, 13, 18, 23)
+UUID_DIGIT_POSITIONS = [position for position in range(UUID_LENGTH) if position not in UUID_DASH_POSITIONS]
+UUID_VERSION_POSITION = 14
+UUID_VARIANT_POSITION = 19
+# Hex digit -> RFC 4122 variant digit (8, 9, a or b).
+UUID_VARIANT_TABLE = bytes.maketrans(b'0123456789abcdef', b'89ab89ab89ab89ab')
+PLACEHOLDER_PATTERN = re.compile(r"@@(\w+)@@")
+
+def _placeholder(name):
+    # Plain ASCII survives both json.dumps passes (event into text, entry into body) unchanged.
+    return "@@{}@@".format(name)
+
+def build_event_template(service, event_name, user_arn, failed):
+    """The encoded entry for one combination as a bytes %-template.
+
+    Returns (template, pick): pick(row) selects, from a tuple of per-event
+    values in TEMPLATE_FIELDS order, the values for the template's %s slots.
+    """
+    fields = {name: _placeholder(name) for name in TEMPLATE_FIELDS}
+    if not failed:
+        fields["error_code"] = None
+    encoded = json.dumps(cloudtrail_entry(service, event_name, user_arn, fields)).replace("%", "%%")
+    for name in NUMERIC_TEMPLATE_FIELDS:
+        encoded = encoded.replace(json.dumps(fields[name]), fields[name])
+    slots = [TEMPLATE_FIELDS.index(name) for name in PLACEHOLDER_PATTERN.findall(encoded)]
+    return PLACEHOLDER_PATTERN.sub("%s", encoded).encode("utf-8"), operator.itemgetter(*slots)
+
+EVENT_TEMPLATES = {
+    (service, event_name, user_arn, failed): build_event_template(service, event_name, user_arn, failed)
+    for service, event_name in EVENT_KINDS
+    for user_arn in AWS_USERS
+    for failed in (False, True)
+}
+
+def _encoded_choices(population, n):
+    return random.choices([value.encode("utf-8") for value in population], k=n)
+
+def generate_source_ips(n):
+    """n encoded addresses from the generate_realistic_ip() ranges."""
+    ips = []
+    for pattern, a, b in zip(random.choices(range(4), k=n), os.urandom(n), os.urandom(n)):
+        if pattern == 0:
+            ips.append(b"54.240.197.%d/32" % (a % 255 + 1))
+        elif pattern == 1:
+            ips.append(b"52.95.%d.%d/32" % (a, b))
+        elif pattern == 2:
+            ips.append(b"203.0.113.%d/32" % (a % 254 + 1))
+        else:
+            ips.append(b"198.51.100.%d/32" % (a % 254 + 1))
+    return ips
+
+def generate_uuids(n):
+    """n random version 4 UUIDs as encoded strings, laid out with strided slice copies."""
+    digits = os.urandom(n * 16).hex().encode("ascii")
+    laid_out = bytearray(n * UUID_LENGTH)
+    for digit, position in enumerate(UUID_DIGIT_POSITIONS):
+        laid_out[position::UUID_LENGTH] = digits[digit::32]
+    for position in UUID_DASH_POSITIONS:
+        laid_out[position::UUID_LENGTH] = b"-" * n
+    laid_out[UUID_VERSION_POSITION::UUID_LENGTH] = b"4" * n
+    laid_out[UUID_VARIANT_POSITION::UUID_LENGTH] = laid_out[UUID_VARIANT_POSITION::UUID_LENGTH].translate(UUID_VARIANT_TABLE)
+    return _split(bytes(laid_out), UUID_LENGTH)
+
+def _split(data, width):
+    return [data[i:i + width] for i in range(0, len(data), width)]
+
+class CloudTrailEvents:
+    """n generated CloudTrail events held column-wise; templates are patched on emit.
+
+    Per-event values are kept in self.values as UTF-8 bytes, one list per
+    TEMPLATE_FIELDS entry.
+    """
+
+    def __init__(self, n, timestamps=None):
+        self.timestamps = timestamps if timestamps is not None else [time.time()] * n
+        event_times = [event_time.encode("ascii") for event_time in iso_timestamps(self.timestamps)]
+        self.kinds = random.choices(EVENT_KINDS, weights=EVENT_KIND_WEIGHTS, k=n)
+        self.users = random.choices(AWS_USERS, k=n)
+        self.failed = [random.random() < FAILURE_RATE for _ in range(n)]
+        ids = os.urandom(n * 32).translate(ID_CHARACTER_TABLE)
+        self.values = [
+            event_times,
+            generate_uuids(n),
+            generate_uuids(n),
+            _split(ids[:n * 16], 16),
+            _split(ids[n * 16:], 16),
+            _encoded_choices(AWS_REGIONS, n),
+            generate_source_ips(n),
+            _encoded_choices(USER_AGENTS, n),
+            _split(os.urandom(n * 4).hex().encode("ascii"), 8),
+            _encoded_choices(INSTANCE_TYPES, n),
+            _split(os.urandom(n * 12).translate(DIGIT_TABLE), 12),
+            _encoded_choices(ERROR_CODES, n),
+            # Epoch ms as json.dumps() writes the float, so both emit paths agree.
+            [repr(round(timestamp * 1000, 3)).encode("ascii") for timestamp in self.timestamps],
+        ]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def _keys(self):
+        return ((service, event_name, user_arn, failed)
+                for (service, event_name), user_arn, failed in zip(self.kinds, self.users, self.failed))
+
+    def __iter__(self):
+        """Yields each event as the dict generate_cloudtrail_event() would build."""
+        for key, row in zip(self._keys(), zip(*self.values)):
+            fields = {name: value.decode("utf-8") for name, value in zip(TEMPLATE_FIELDS, row)}
+            fields["timestamp"] = float(fields["timestamp"])
+            if not key[3]:
+                fields["error_code"] = None
+            yield cloudtrail_entry(key[0], key[1], key[2], fields)
+
+    def encoded(self):
+        """Returns each event as UTF-8 JSON by filling in its pre-serialized template."""
+        templates = EVENT_TEMPLATES
+        encoded = []
+        for key, row in zip(self._keys(), zip(*self.values)):
+            template, pick = templates[key]
+            encoded.append(template % pick(row))
+        return encoded
+
+    def columns(self):
+        """Returns the events as {column: values} for TABLE_SCHEMA."""
+        fields = dict(zip(TEMPLATE_FIELDS, self.values))
+        names = [event_name for _, event_name in self.kinds]
+        return {
+            "event_time": [round(timestamp * 1e6) for timestamp in self.timestamps],
+            "event_source": ["{}.amazonaws.com".format(service) for service, _ in self.kinds],
+            "event_name": names,
+            "aws_region": fields["region"],
+            "user_arn": self.users,
+            "source_ip": fields["source_ip"],
+            "user_agent": fields["user_agent"],
+            "error_code": [code if failed else None for code, failed in zip(fields["error_code"], self.failed)],
+            "event_id": fields["event_id"],
+            "request_id": fields["request_id"],
+            "principal_id": fields["principal_id"],
+            "access_key_id": fields["access_key_id"],
+            "image_id": [value if name == "RunInstances" else None for value, name in zip(fields["image_id"], names)],
+            "instance_type": [value if name == "RunInstances" else None for value, name in zip(fields["instance_type"], names)],
+            "bucket_name": [value if name == "CreateBucket" else None for value, name in zip(fields["bucket_name"], names)],
+        }
+
+def generate_cloudtrail_events(n, timestamps=None):
+    """Generates n CloudTrail events in bulk, stamped with timestamps (epoch seconds, default now)."""
+    return CloudTrailEvents(n, timestamps)
+
+# === Entry source ===
+async def generate_entries(pace=True):
+    """Yields bursts of 3-15 events with bursty sleeps when paced, or UNPACED_BURST_EVENTS at a time otherwise."""
+    while True:
+        yield generate_cloudtrail_events(random.randint(3, 15) if pace else UNPACED_BURST_EVENTS)
+
+        if pace:
+            # Sleep with variability
+            sleep_seconds = random.uniform(SLEEP_MIN_SECONDS, SLEEP_MAX_SECONDS)
+
+            # Add some burstiness - occasionally sleep shorter or longer
+            if random.random() < 0.1:  # 10% chance
+                sleep_seconds *= random.uniform(0.2, 3.0)
+
+            await asyncio.sleep(sleep_seconds)
+
+# === Historical backfill ===
+async def backfill_entries(args):
+    """Yields CloudTrailEvents covering the --backfill-days range, stamped across it."""
+    start, end = backfill_range(args)
+    shards = max(getattr(args, "workers", 1), 1)
+    day = None
+    for times in event_times(start, end, args.backfill_rate, getattr(args, "worker_id", 0), shards):
+        if iso_timestamp(times[0])[:10] != day:
+            day = iso_timestamp(times[0])[:10]
+            print(f"Backfilling {day}...")
+        yield generate_cloudtrail_events(len(times), times)
+
 # === Main sending loop ===
+async def run(args):
+    sink = make_sink(args, ENVELOPE, ENTRIES_KEY, "CloudTrail events", TABLE_SCHEMA, CloudTrailEvents.columns, signal="logs")
+    if args.backfill_days:
+        entries = backfill_entries(args)
+    else:
+        # Files are written as fast as events can be generated.
+        entries = generate_entries(pace=not (args.no_pace or args.output))
+    await sink.consume(limit_entries(entries, args.max_entries))
+
 def main():
     """Generates and sends CloudTrail logs to Coralogix with a controlled rate."""
-    daily_sent_bytes = 0
-    start_time = time.time()
+    parser = build_parser(main.__doc__, URL, TARGET_BYTES_PER_DAY)
+    add_backfill_arguments(parser, TARGET_LOGS_PER_DAY / SECONDS_PER_DAY)
+    args = parser.parse_args()
+
+    if args.backfill_days:
+        start, end = backfill_range(args)
+        print(f"Backfilling CloudTrail events from {iso_timestamp(start)} to {iso_timestamp(end)} "
+              f"at a mean {args.backfill_rate:.4g} events per simulated second.")
+        if not args.output and args.daily_bytes:
+            print(f"Note: the {args.daily_bytes / 1024 / 1024:.2f} MB daily cap still applies; pass --daily-bytes 0 to lift it.")
+        run_workers(run, args)
+        return
 
     print(f"Starting CloudTrail log generation. Target daily volume: {TARGET_BYTES_PER_DAY / 1024 / 1024:.2f} MB")
     print(f"Average wait time between batches: {AVERAGE_WAIT_SECONDS:.2f} seconds (range: {SLEEP_MIN_SECONDS:.2f} - {SLEEP_MAX_SECONDS:.2f} seconds)")
 
-    while True:
-        # Reset daily counter if a day has passed
-        if time.time() - start_time >= SECONDS_PER_DAY:
-            daily_sent_bytes = 0
-            start_time = time.time()
-            print("\n--- New Day - Daily byte count reset ---")
-
-        # Randomize number of logs per batch (3-15 events)
-        num_logs = random.randint(3, 15)
-        logs = [generate_cloudtrail_event() for _ in range(num_logs)]
-
-        payload = {
-            "privateKey": PRIVATE_KEY,
-            "applicationName": APP_NAME,
-            "subsystemName": SUBSYSTEM_NAME,
-            "logEntries": logs
-        }
-
-        # Calculate actual batch size
-        try:
-            batch_payload_string = json.dumps(payload)
-            batch_size = len(batch_payload_string.encode('utf-8'))
-        except Exception as e:
-            print(f"Error calculating batch size: {e}. Skipping batch.")
-            time.sleep(min(MIN_WAIT_SECONDS, 5))
-            continue
-
-        # Check daily limit
-        if daily_sent_bytes + batch_size > TARGET_BYTES_PER_DAY:
-            elapsed_time_today = time.time() - start_time
-            remaining_time_today = max(0, SECONDS_PER_DAY - elapsed_time_today)
-            
-            if remaining_time_today > 0:
-                print(f"Daily byte limit approached. Sent {daily_sent_bytes / 1024 / 1024:.2f} MB so far.")
-                print(f"Waiting for {remaining_time_today:.2f} seconds until the next day starts.")
-                time.sleep(remaining_time_today + 5)
-                daily_sent_bytes = 0
-                start_time = time.time()
-                print("\n--- New Day - Daily byte count reset ---")
-                continue
-            else:
-                print(f"Daily byte limit exceeded. Sent {daily_sent_bytes / 1024 / 1024:.2f} MB.")
-                time.sleep(600)
-                continue
-
-        # Send logs
-        try:
-            response = requests.post(URL, json=payload, headers={"Content-Type": "application/json"})
-            print(f"Sent {num_logs} CloudTrail events ({batch_size} bytes). Response: {response.status_code}. Total sent today: { (daily_sent_bytes + batch_size) / 1024:.2f} KB")
-            daily_sent_bytes += batch_size
-
-            if response.status_code != 200:
-                print(f"Error sending logs. Status Code: {response.status_code}")
-                try:
-                    print(f"Response Body: {response.json()}")
-                except json.JSONDecodeError:
-                    print(f"Response Body: {response.text}")
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending logs: {e}")
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
-
-        # Sleep with variability
-        sleep_seconds = random.uniform(SLEEP_MIN_SECONDS, SLEEP_MAX_SECONDS)
-        
-        # Add some burstiness - occasionally sleep shorter or longer
-        if random.random() < 0.1:  # 10% chance
-            sleep_seconds *= random.uniform(0.2, 3.0)
-        
-        print(f"Sleeping for {sleep_seconds:.2f} seconds...")
-        time.sleep(sleep_seconds)
+    run_workers(run, args)
 
 if __name__ == "__main__":
     main()
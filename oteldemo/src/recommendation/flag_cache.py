@@ -0,0 +1,127 @@
+#!/usr/bin/python
+
+# Copyright The OpenTelemetry Authors
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import threading
+import time
+
+from openfeature import api
+from openfeature.event import ProviderEvent
+
+logger = logging.getLogger('main')
+
+# Default value type -> client method evaluating flags of that type; bool before int.
+EVALUATORS = (
+    (bool, 'get_boolean_details'),
+    (int, 'get_integer_details'),
+    (float, 'get_float_details'),
+    (str, 'get_string_details'),
+)
+
+
+class FlagCache:
+    """Last evaluated value of each known flag, read without a flagd round-trip.
+
+    flags maps flag names to their defaults, whose type picks the evaluation.
+    Values are re-evaluated when the provider becomes ready or reports changed
+    flags: flagd pushes changes over its event stream, and the in-process
+    resolver (FLAGD_RESOLVER=in-process) over its sync stream. As a bound on
+    staleness in case an event is missed, a lookup that finds the values older
+    than max_staleness seconds starts one background re-evaluation and is
+    served the current values meanwhile. A failed evaluation keeps the
+    previous value; until the first one a flag reads as its default. Values
+    only count as fresh once every flag evaluated without error; while
+    evaluations fail they are retried at most every retry_after seconds.
+    """
+
+    def __init__(self, client, flags, max_staleness=30.0, refresh_counter=None, retry_after=5.0):
+        self._client = client
+        self._defaults = dict(flags)
+        self._values = dict(flags)
+        self.max_staleness = max_staleness
+        self.retry_after = retry_after
+        self._refresh_counter = refresh_counter
+        # _lock serializes evaluations; _refreshing is held by the one background refresh.
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        # Last refresh of all flags that succeeded, and the last one attempted.
+        self._refreshed_at = None
+        self._attempted_at = None
+
+    def subscribe(self):
+        """Re-evaluate on provider events; the ready handler runs at once if the provider already is."""
+        api.add_handler(ProviderEvent.PROVIDER_READY, self._on_ready)
+        api.add_handler(ProviderEvent.PROVIDER_CONFIGURATION_CHANGED, self._on_change)
+
+    def get(self, name):
+        """The cached value of a flag given to the constructor."""
+        refreshed_at = self._refreshed_at
+        if refreshed_at is None or time.monotonic() - refreshed_at >= self.max_staleness:
+            attempted_at = self._attempted_at
+            if attempted_at is None or time.monotonic() - attempted_at >= self.retry_after:
+                self._refresh_in_background()
+        return self._values[name]
+
+    def age(self):
+        """Seconds since all flags were last evaluated without error, or None before the first time."""
+        refreshed_at = self._refreshed_at
+        return None if refreshed_at is None else time.monotonic() - refreshed_at
+
+    def _on_ready(self, event_details):
+        self.refresh(trigger='ready')
+
+    def _on_change(self, event_details):
+        changed = event_details.flags_changed
+        if changed is None:
+            self.refresh(trigger='changed')
+        else:
+            names = [name for name in changed if name in self._defaults]
+            if names:
+                self.refresh(names, trigger='changed')
+
+    def _refresh_in_background(self):
+        if not self._refreshing.acquire(blocking=False):
+            return
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh(trigger='stale')
+        finally:
+            self._refreshing.release()
+
+    def refresh(self, names=None, trigger='manual'):
+        """Re-evaluate the named flags, or all of them."""
+        with self._lock:
+            started_at = time.monotonic()
+            values = dict(self._values)
+            failed = 0
+            for name in self._defaults if names is None else names:
+                details = self._evaluate(name)
+                if details is None or details.error_code is not None:
+                    failed += 1
+                    continue
+                values[name] = details.value
+            # Readers get either the old or the new dict, never a partly updated one.
+            self._values = values
+            if names is None:
+                self._attempted_at = started_at
+                if not failed:
+                    self._refreshed_at = started_at
+        if self._refresh_counter is not None:
+            self._refresh_counter.add(1, {'flag_cache.trigger': trigger, 'flag_cache.failed': failed > 0})
+        if failed:
+            logger.warning(f"FlagCache: {failed} flag evaluation(s) failed on {trigger} refresh, keeping previous values")
+
+    def _evaluate(self, name):
+        default = self._defaults[name]
+        for kind, method in EVALUATORS:
+            if isinstance(default, kind):
+                try:
+                    return getattr(self._client, method)(name, default)
+                except Exception as e:
+                    logger.warning(f"FlagCache: evaluating {name} failed: {e}")
+                    return None
+        raise TypeError(f"unsupported default for flag {name}: {default!r}")
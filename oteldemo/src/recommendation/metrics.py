@@ -3,6 +3,9 @@
 # Copyright The OpenTelemetry Authors
 # SPDX-License-Identifier: Apache-2.0
 
+from opentelemetry.metrics import Observation
+
+
 def init_metrics(meter):
 
     # Recommendations counter
@@ -10,8 +13,26 @@ def init_metrics(meter):
         'app_recommendations_counter', unit='recommendations', description="Counts the total number of given recommendations"
     )
 
+    # Feature flag cache refreshes
+    app_flag_cache_refresh_counter = meter.create_counter(
+        'app_flag_cache_refresh_counter', unit='refreshes', description="Counts feature flag cache refreshes by trigger"
+    )
+
     rec_svc_metrics = {
         "app_recommendations_counter": app_recommendations_counter,
+        "app_flag_cache_refresh_counter": app_flag_cache_refresh_counter,
     }
 
     return rec_svc_metrics
+
+
+def init_flag_cache_metrics(meter, flag_cache):
+
+    # Seconds since the feature flag cache last evaluated every flag without error
+    def observe_age(options):
+        age = flag_cache.age()
+        return [] if age is None else [Observation(age)]
+
+    return meter.create_observable_gauge(
+        'app_flag_cache_age', callbacks=[observe_age], unit='s', description="Age of the cached feature flag values"
+    )
@@ -0,0 +1,205 @@
+#!/usr/bin/python
+
+# Copyright The OpenTelemetry Authors
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import itertools
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger('main')
+
+
+class ProductIndex:
+    """Immutable product ids for sampling recommendations, built once per catalog refresh.
+
+    The ids live in a tuple, so sampling picks random positions instead of
+    rebuilding sets or lists per request.
+    """
+
+    def __init__(self, ids):
+        self.ids = tuple(dict.fromkeys(ids))
+        self._members = frozenset(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def count_excluding(self, excluded):
+        """How many ids are not in the excluded set."""
+        return len(self.ids) - sum(1 for product_id in excluded if product_id in self._members)
+
+    def sample(self, k, excluded):
+        """Up to k distinct random ids not in the excluded set.
+
+        Rejection sampling: random positions are drawn until k acceptable
+        ones are found, which takes O(k) draws while at least half of the ids
+        are acceptable. Otherwise the few acceptable ids are collected first.
+        """
+        available = self.count_excluding(excluded)
+        k = min(k, available)
+        if k <= 0:
+            return []
+        if available < 2 * k:
+            return random.sample([product_id for product_id in self.ids if product_id not in excluded], k)
+        ids = self.ids
+        chosen = {}
+        while len(chosen) < k:
+            position = random.randrange(len(ids))
+            if position not in chosen and ids[position] not in excluded:
+                chosen[position] = ids[position]
+        return list(chosen.values())
+
+
+class ProductCache:
+    """Deduplicated, bounded set of catalog product ids with a TTL.
+
+    fetch() returns the catalog's product ids, which are kept as a
+    ProductIndex of at most capacity ids. A snapshot is served for
+    ttl seconds; once refresh_ahead of the TTL has passed, the next request
+    starts one background refresh and keeps getting the current snapshot.
+    Only an empty or expired cache makes requests wait, and then a single
+    caller fetches while the others wait for and share its result. If a
+    refresh fails the previous snapshot stays in use, expired or not, and no
+    fetch is tried again for retry_after seconds; an empty cache raises the
+    failure instead.
+    """
+
+    def __init__(self, fetch, ttl=60.0, capacity=10000, refresh_ahead=0.8, retry_after=5.0):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.capacity = capacity
+        self.refresh_ahead = refresh_ahead
+        self.retry_after = retry_after
+        # _lock serializes loads; _refreshing is held by the one background refresh.
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._index = ProductIndex(())
+        self._loaded_at = None
+        # Load attempts so far, and the failure of the last one, if it failed.
+        self._attempts = 0
+        self._error = None
+        self._failed_at = None
+
+    def get(self):
+        """Return (ProductIndex, cache hit)."""
+        attempts = self._attempts
+        if self._serve_cached(self._loaded_at):
+            return self._index, True
+        return self._refresh_now(attempts), False
+
+    def _serve_cached(self, loaded_at):
+        """Whether the snapshot loaded at loaded_at may be served; starts a background refresh once one is due."""
+        if loaded_at is None:
+            return False
+        age = time.monotonic() - loaded_at
+        if age < self.ttl * self.refresh_ahead:
+            return True
+        if age < self.ttl:
+            if not self._backing_off():
+                self._refresh_in_background()
+            return True
+        # Expired: keep serving it while a failed refresh backs off.
+        return self._backing_off()
+
+    def _backing_off(self):
+        failed_at = self._failed_at
+        return failed_at is not None and time.monotonic() - failed_at < self.retry_after
+
+    def invalidate(self):
+        """Mark the snapshot due for refresh; it is still served until the refresh completes."""
+        if self._loaded_at is not None:
+            self._loaded_at = min(self._loaded_at, time.monotonic() - self.ttl * self.refresh_ahead)
+
+    def _refresh_now(self, seen_attempts):
+        with self._lock:
+            # Callers that waited for the lock share the outcome of the load they waited for.
+            if self._attempts == seen_attempts and not self._backing_off():
+                self._load()
+            return self._snapshot()
+
+    def _snapshot(self):
+        if self._loaded_at is None:
+            raise self._error
+        return self._index
+
+    def _refresh_in_background(self):
+        if not self._refreshing.acquire(blocking=False):
+            return
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            with self._lock:
+                self._load()
+        finally:
+            self._refreshing.release()
+
+    def _load(self):
+        try:
+            ids = self._fetch()
+        except Exception as e:
+            self._fetch_failed(e)
+            return
+        self._store(ids)
+
+    def _fetch_failed(self, error):
+        self._error = error
+        self._failed_at = time.monotonic()
+        self._attempts += 1
+        if self._loaded_at is None:
+            logger.warning(f"{type(self).__name__}: loading the product list failed: {error}")
+        else:
+            logger.warning(f"{type(self).__name__}: refresh failed, serving the previous product list: {error}")
+
+    def _store(self, ids):
+        self._index = ProductIndex(itertools.islice(dict.fromkeys(ids), self.capacity))
+        self._loaded_at = time.monotonic()
+        self._error = self._failed_at = None
+        self._attempts += 1
+
+
+class AsyncProductCache(ProductCache):
+    """ProductCache for asyncio servers: fetch is a coroutine function and get() is awaited.
+
+    Loads are serialized by an asyncio.Lock and the refresh-ahead runs as a
+    task on the event loop, so waiting for the catalog never holds a thread.
+    """
+
+    def __init__(self, fetch, ttl=60.0, capacity=10000, refresh_ahead=0.8, retry_after=5.0):
+        super().__init__(fetch, ttl=ttl, capacity=capacity, refresh_ahead=refresh_ahead, retry_after=retry_after)
+        self._lock = asyncio.Lock()
+        self._refresh_task = None
+
+    async def get(self):
+        """Return (ProductIndex, cache hit)."""
+        attempts = self._attempts
+        if self._serve_cached(self._loaded_at):
+            return self._index, True
+        return await self._refresh_now(attempts), False
+
+    async def _refresh_now(self, seen_attempts):
+        async with self._lock:
+            # Callers that waited for the lock share the outcome of the load they waited for.
+            if self._attempts == seen_attempts and not self._backing_off():
+                await self._load()
+            return self._snapshot()
+
+    def _refresh_in_background(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.get_running_loop().create_task(self._background_refresh())
+
+    async def _background_refresh(self):
+        async with self._lock:
+            await self._load()
+
+    async def _load(self):
+        try:
+            ids = await self._fetch()
+        except Exception as e:
+            self._fetch_failed(e)
+            return
+        self._store(ids)
@@ -5,6 +5,7 @@
 
 
 # Python
+import asyncio
 import os
 import random
 from concurrent import futures
@@ -33,84 +34,122 @@ from grpc_health.v1 import health_pb2
 from grpc_health.v1 import health_pb2_grpc
 
 from metrics import (
-    init_metrics
+    init_metrics,
+    init_flag_cache_metrics
 )
+from product_cache import AsyncProductCache, ProductCache
+from flag_cache import FlagCache
+
+# Flags read by the service, with their defaults
+FEATURE_FLAGS = {
+    "recommendationCacheFailure": False,
+}
+# RECOMMENDATION_SERVER_MODE values: a thread pool server, or grpc.aio on one event loop
+SERVER_MODES = ('thread', 'aio')
 
-cached_ids = []
-first_run = True
 
 class RecommendationService(demo_pb2_grpc.RecommendationServiceServicer):
     def ListRecommendations(self, request, context):
         prod_list = get_product_list(request.product_ids)
-        span = trace.get_current_span()
-        span.set_attribute("app.products_recommended.count", len(prod_list))
-        logger.info(f"Receive ListRecommendations for product ids:{prod_list}")
+        return recommendations_response(prod_list)
 
-        # build and return response
-        response = demo_pb2.ListRecommendationsResponse()
-        response.product_ids.extend(prod_list)
+    def Check(self, request, context):
+        return health_pb2.HealthCheckResponse(
+            status=health_pb2.HealthCheckResponse.SERVING)
 
-        # Collect metrics for this service
-        rec_svc_metrics["app_recommendations_counter"].add(len(prod_list), {'recommendation.type': 'catalog'})
+    def Watch(self, request, context):
+        return health_pb2.HealthCheckResponse(
+            status=health_pb2.HealthCheckResponse.UNIMPLEMENTED)
 
-        return response
 
-    def Check(self, request, context):
+class AsyncRecommendationService(demo_pb2_grpc.RecommendationServiceServicer):
+    """RecommendationService for the grpc.aio server; product_cache is an AsyncProductCache."""
+
+    async def ListRecommendations(self, request, context):
+        prod_list = await get_product_list_async(request.product_ids)
+        return recommendations_response(prod_list)
+
+    async def Check(self, request, context):
         return health_pb2.HealthCheckResponse(
             status=health_pb2.HealthCheckResponse.SERVING)
 
-    def Watch(self, request, context):
+    async def Watch(self, request, context):
         return health_pb2.HealthCheckResponse(
             status=health_pb2.HealthCheckResponse.UNIMPLEMENTED)
 
 
+def recommendations_response(prod_list):
+    span = trace.get_current_span()
+    span.set_attribute("app.products_recommended.count", len(prod_list))
+    logger.info(f"Receive ListRecommendations for product ids:{prod_list}")
+
+    # build and return response
+    response = demo_pb2.ListRecommendationsResponse()
+    response.product_ids.extend(prod_list)
+
+    # Collect metrics for this service
+    rec_svc_metrics["app_recommendations_counter"].add(len(prod_list), {'recommendation.type': 'catalog'})
+
+    return response
+
+
 def get_product_list(request_product_ids):
-    global first_run
-    global cached_ids
     with tracer.start_as_current_span("get_product_list") as span:
-        max_responses = 5
-
-        # Formulate the list of characters to list of strings
-        request_product_ids_str = ''.join(request_product_ids)
-        request_product_ids = request_product_ids_str.split(',')
-
-        # Feature flag scenario - Cache Leak
-        if check_feature_flag("recommendationCacheFailure"):
-            span.set_attribute("app.recommendation.cache_enabled", True)
-            if random.random() < 0.5 or first_run:
-                first_run = False
-                span.set_attribute("app.cache_hit", False)
-                logger.info("get_product_list: cache miss")
-                cat_response = product_catalog_stub.ListProducts(demo_pb2.Empty())
-                response_ids = [x.id for x in cat_response.products]
-                cached_ids = cached_ids + response_ids
-                cached_ids = cached_ids + cached_ids[:len(cached_ids) // 4]
-                product_ids = cached_ids
-            else:
-                span.set_attribute("app.cache_hit", True)
-                logger.info("get_product_list: cache hit")
-                product_ids = cached_ids
-        else:
-            span.set_attribute("app.recommendation.cache_enabled", False)
-            cat_response = product_catalog_stub.ListProducts(demo_pb2.Empty())
-            product_ids = [x.id for x in cat_response.products]
-
-        span.set_attribute("app.products.count", len(product_ids))
-
-        # Create a filtered list of products excluding the products received as input
-        filtered_products = list(set(product_ids) - set(request_product_ids))
-        num_products = len(filtered_products)
-        span.set_attribute("app.filtered_products.count", num_products)
-        num_return = min(max_responses, num_products)
-
-        # Sample list of indicies to return
-        indices = random.sample(range(num_products), num_return)
-        # Fetch product ids from indices
-        prod_list = [filtered_products[i] for i in indices]
-
-        span.set_attribute("app.filtered_products.list", prod_list)
-
-        return prod_list
+        apply_cache_failure_flag(span)
+        product_index, cache_hit = product_cache.get()
+        return sample_product_list(span, product_index, cache_hit, request_product_ids)
+
+
+async def get_product_list_async(request_product_ids):
+    with tracer.start_as_current_span("get_product_list") as span:
+        apply_cache_failure_flag(span)
+        product_index, cache_hit = await product_cache.get()
+        return sample_product_list(span, product_index, cache_hit, request_product_ids)
+
+
+def apply_cache_failure_flag(span):
+    span.set_attribute("app.recommendation.cache_enabled", True)
+    # Feature flag scenario - Cache Failure: half of the requests invalidate the cache. The
+    # current product list keeps being served while a single background refresh runs.
+    if check_feature_flag("recommendationCacheFailure") and random.random() < 0.5:
+        product_cache.invalidate()
+
+
+def sample_product_list(span, product_index, cache_hit, request_product_ids):
+    max_responses = 5
+
+    span.set_attribute("app.cache_hit", cache_hit)
+    logger.info(f"get_product_list: cache {'hit' if cache_hit else 'miss'}")
+
+    span.set_attribute("app.products.count", len(product_index))
+
+    # Sample products excluding the products received as input
+    excluded = parse_request_product_ids(request_product_ids)
+    span.set_attribute("app.filtered_products.count", product_index.count_excluding(excluded))
+    prod_list = product_index.sample(max_responses, excluded)
+
+    span.set_attribute("app.filtered_products.list", prod_list)
+
+    return prod_list
+
+
+def parse_request_product_ids(product_ids):
+    """The request's product ids as a container for membership tests.
+
+    product_ids is the repeated proto field and is read in place. The usual
+    request carries a single id. Clients that pass one string where the
+    field expects a list arrive in a legacy form, either one element per
+    character or one comma-delimited element; those are detected and
+    rebuilt.
+    """
+    if len(product_ids) == 1:
+        product_id = product_ids[0]
+        if ',' not in product_id:
+            return (product_id,)
+        return frozenset(product_id.split(','))
+    if len(product_ids) > 1 and all(len(product_id) == 1 for product_id in product_ids):
+        return frozenset(''.join(product_ids).split(','))
+    return frozenset(product_ids)
 
 
 def must_map_env(key: str):
@@ -121,13 +160,41 @@ def must_map_env(key: str):
 
 
 def check_feature_flag(flag_name: str):
-    # Initialize OpenFeature
-    client = api.get_client()
-    return client.get_boolean_value("recommendationCacheFailure", False)
+    return flag_cache.get(flag_name)
+
+
+async def serve_aio(catalog_addr, port, cache_ttl, cache_capacity, catalog_timeout):
+    """Run the services on a grpc.aio server, with an async ProductCatalog client."""
+    global product_cache
+    pc_channel = grpc.aio.insecure_channel(catalog_addr)
+    product_catalog_stub = demo_pb2_grpc.ProductCatalogServiceStub(pc_channel)
+
+    async def list_product_ids():
+        response = await product_catalog_stub.ListProducts(demo_pb2.Empty(), timeout=catalog_timeout)
+        return [product.id for product in response.products]
+
+    product_cache = AsyncProductCache(list_product_ids, ttl=cache_ttl, capacity=cache_capacity)
+
+    # Create gRPC server
+    server = grpc.aio.server()
+
+    # Add class to gRPC server
+    service = AsyncRecommendationService()
+    demo_pb2_grpc.add_RecommendationServiceServicer_to_server(service, server)
+    health_pb2_grpc.add_HealthServicer_to_server(service, server)
+
+    # Start server
+    server.add_insecure_port(f'[::]:{port}')
+    await server.start()
+    logger.info(f'Recommendation service started in aio mode, listening on port {port}')
+    await server.wait_for_termination()
 
 
 if __name__ == "__main__":
     service_name = must_map_env('OTEL_SERVICE_NAME')
+    server_mode = os.environ.get('RECOMMENDATION_SERVER_MODE', 'thread')
+    if server_mode not in SERVER_MODES:
+        raise Exception(f'RECOMMENDATION_SERVER_MODE must be one of {", ".join(SERVER_MODES)}, not {server_mode}')
     api.set_provider(FlagdProvider(host=os.environ.get('FLAGD_HOST', 'flagd'), port=os.environ.get('FLAGD_PORT', 8013)))
     api.add_hooks([TracingHook()])
 
@@ -136,6 +203,16 @@ if __name__ == "__main__":
     meter = metrics.get_meter_provider().get_meter(service_name)
     rec_svc_metrics = init_metrics(meter)
 
+    # Feature flags are read from a local cache kept current by provider events
+    flag_cache = FlagCache(
+        api.get_client(),
+        FEATURE_FLAGS,
+        max_staleness=float(os.environ.get('FLAG_CACHE_MAX_STALENESS', 30)),
+        refresh_counter=rec_svc_metrics["app_flag_cache_refresh_counter"],
+    )
+    flag_cache.subscribe()
+    init_flag_cache_metrics(meter, flag_cache)
+
     # Initialize Logs
     logger_provider = LoggerProvider(
         resource=Resource.create(
@@ -154,20 +231,34 @@ if __name__ == "__main__":
     logger.addHandler(handler)
 
     catalog_addr = must_map_env('PRODUCT_CATALOG_ADDR')
-    pc_channel = grpc.insecure_channel(catalog_addr)
-    product_catalog_stub = demo_pb2_grpc.ProductCatalogServiceStub(pc_channel)
-
-    # Create gRPC server
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-
-    # Add class to gRPC server
-    service = RecommendationService()
-    demo_pb2_grpc.add_RecommendationServiceServicer_to_server(service, server)
-    health_pb2_grpc.add_HealthServicer_to_server(service, server)
-
-    # Start server
     port = must_map_env('RECOMMENDATION_PORT')
-    server.add_insecure_port(f'[::]:{port}')
-    server.start()
-    logger.info(f'Recommendation service started, listening on port {port}')
-    server.wait_for_termination()
+    cache_ttl = float(os.environ.get('RECOMMENDATION_CACHE_TTL', 60))
+    cache_capacity = int(os.environ.get('RECOMMENDATION_CACHE_CAPACITY', 10000))
+    # Deadline for ListProducts, so a hung catalog cannot hold up the cache refresh indefinitely
+    catalog_timeout = float(os.environ.get('PRODUCT_CATALOG_TIMEOUT', 5))
+
+    if server_mode == 'aio':
+        asyncio.run(serve_aio(catalog_addr, port, cache_ttl, cache_capacity, catalog_timeout))
+    else:
+        pc_channel = grpc.insecure_channel(catalog_addr)
+        product_catalog_stub = demo_pb2_grpc.ProductCatalogServiceStub(pc_channel)
+        product_cache = ProductCache(
+            lambda: [product.id for product in
+                     product_catalog_stub.ListProducts(demo_pb2.Empty(), timeout=catalog_timeout).products],
+            ttl=cache_ttl,
+            capacity=cache_capacity,
+        )
+
+        # Create gRPC server
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+
+        # Add class to gRPC server
+        service = RecommendationService()
+        demo_pb2_grpc.add_RecommendationServiceServicer_to_server(service, server)
+        health_pb2_grpc.add_HealthServicer_to_server(service, server)
+
+        # Start server
+        server.add_insecure_port(f'[::]:{port}')
+        server.start()
+        logger.info(f'Recommendation service started, listening on port {port}')
+        server.wait_for_termination()
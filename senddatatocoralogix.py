@@ -1,8 +1,13 @@
-import requests
+import asyncio
+import json
+import os
 import random
 import time
-import json
-from datetime import datetime
+from datetime import datetime, timezone
+
+from shipper.cli import build_parser, make_sink
+from shipper.sinks import limit_entries
+from shipper.workers import run_workers
 
 # === CONFIG ===
 # Coralogix Private Key - Re-inserted the key used in the user's successful curl requests
@@ -12,6 +17,13 @@ SUBSYSTEM_NAME = "demo-subsystem"
 # Coralogix Logs Ingestion URL for your region
 # This URL worked with the provided key in the user's curl attempts.
 URL = "https://ingress.cx498.coralogix.com/api/v1/logs"
+# Request body: these fields plus the batch under ENTRIES_KEY
+ENVELOPE = {
+    "privateKey": PRIVATE_KEY,
+    "applicationName": APP_NAME,
+    "subsystemName": SUBSYSTEM_NAME,
+}
+ENTRIES_KEY = "logEntries"
 
 # === CONSTANTS ===
 # Target data volume per day: 1 MB
@@ -30,7 +42,7 @@ TARGET_LOGS_PER_DAY = TARGET_BYTES_PER_DAY / ESTIMATED_AVG_LOG_BYTE_SIZE
 # Total seconds in a day
 SECONDS_PER_DAY = 24 * 60 * 60
 
-# Average number of logs to send per batch to maintain some variability
+# Average number of logs generated per burst to maintain some variability
 AVERAGE_LOGS_PER_BATCH = (5 + 15) / 2 # Based on the random.randint(5, 15)
 
 # Approximate number of batches per day to hit the target log count
@@ -54,26 +66,32 @@ SLEEP_JITTER_SECONDS = AVERAGE_WAIT_SECONDS * 0.5 # 50% jitter
 SLEEP_MIN_SECONDS = max(MIN_WAIT_SECONDS, AVERAGE_WAIT_SECONDS - SLEEP_JITTER_SECONDS)
 SLEEP_MAX_SECONDS = AVERAGE_WAIT_SECONDS + SLEEP_JITTER_SECONDS
 
+# Logs generated per burst when pacing is off (--no-pace)
+UNPACED_BURST_LOGS = 1000
+
 
 # === Simple OTEL-style log generator ===
+# Severity levels: 1=Debug, 2=Verbose, 3=Info, 4=Warning, 5=Error, 6=Critical
+SEVERITIES = [1, 2, 3, 4, 5, 6]
+LOG_MESSAGES = [
+    "processing request",
+    "fetching data from upstream service",
+    "database query successful",
+    "response sent to client",
+    "error encountered in processing",
+    "retrying failed operation",
+    "user login successful",
+    "background task completed",
+    "cache refresh initiated",
+    "configuration reloaded"
+]
+
 def generate_log():
     """Generates a single log entry with random data."""
     trace_id = ''.join(random.choices('abcdef0123456789', k=32))
     span_id = ''.join(random.choices('abcdef0123456789', k=16))
-    # Severity levels: 1=Debug, 2=Verbose, 3=Info, 4=Warning, 5=Error, 6=Critical
-    severity = random.choice([1, 2, 3, 4, 5, 6])
-    message = random.choice([
-        "processing request",
-        "fetching data from upstream service",
-        "database query successful",
-        "response sent to client",
-        "error encountered in processing",
-        "retrying failed operation",
-        "user login successful",
-        "background task completed",
-        "cache refresh initiated",
-        "configuration reloaded"
-    ])
+    severity = random.choice(SEVERITIES)
+    message = random.choice(LOG_MESSAGES)
     log = {
         "text": f"{datetime.utcnow().isoformat()}Z {message} trace_id={trace_id} span_id={span_id}",
         "severity": severity,
@@ -89,93 +107,128 @@ def generate_log():
     }
     return log
 
+# === Bulk log generator ===
+# Logs generated within the same quantum share one timestamp string.
+TIMESTAMP_QUANTUM_SECONDS = 0.001
+# Trace id (16 bytes) and span id (8 bytes) come from one urandom call per batch.
+ID_BYTES_PER_LOG = 24
+
+# The JSON generate_log() would encode to, with the variable fields left as
+# %-placeholders: timestamp, message, trace_id, span_id, severity, trace_id, span_id.
+ENCODED_LOG_TEMPLATE = (
+    '{"text": "%sZ %s trace_id=%s span_id=%s", "severity": %d, "resource": '
+    + json.dumps({"application": APP_NAME, "subsystem": SUBSYSTEM_NAME}).replace("%", "%%")
+    + ', "attributes": {"trace_id": "%s", "span_id": "%s"}}'
+)
+# Columns written for --output .parquet/.arrow, as built by LogColumns.columns().
+# A log's text is not stored; it is "<timestamp>Z <message> trace_id=<hex> span_id=<hex>".
+TABLE_SCHEMA = [
+    ("timestamp", "timestamp"),
+    ("severity", "int8"),
+    ("message", "dictionary"),
+    ("trace_id", "fixed_binary:16"),
+    ("span_id", "fixed_binary:8"),
+]
+# Messages as they appear inside a JSON string.
+ENCODED_LOG_MESSAGES = [json.dumps(message)[1:-1].replace("%", "%%") for message in LOG_MESSAGES]
+
+_timestamp_cache = (None, None)
+
+def quantized_timestamp():
+    """ISO-8601 UTC time, recomputed at most once per TIMESTAMP_QUANTUM_SECONDS."""
+    global _timestamp_cache
+    now = time.time()
+    quantum = int(now / TIMESTAMP_QUANTUM_SECONDS)
+    if _timestamp_cache[0] != quantum:
+        stamp = datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None).isoformat()
+        _timestamp_cache = (quantum, stamp)
+    return _timestamp_cache[1]
+
+
+class LogColumns:
+    """n generated logs held column-wise; dicts or JSON are only built on emit."""
+
+    def __init__(self, n):
+        self.id_bytes = os.urandom(n * ID_BYTES_PER_LOG)
+        ids = self.id_bytes.hex()
+        step = ID_BYTES_PER_LOG * 2
+        self.timestamp = quantized_timestamp()
+        self.trace_ids = [ids[i:i + 32] for i in range(0, len(ids), step)]
+        self.span_ids = [ids[i + 32:i + step] for i in range(0, len(ids), step)]
+        self.severities = random.choices(SEVERITIES, k=n)
+        self.message_indexes = random.choices(range(len(LOG_MESSAGES)), k=n)
+
+    def __len__(self):
+        return len(self.severities)
+
+    def __iter__(self):
+        """Yields each log as the same dict generate_log() would build."""
+        resource = {"application": APP_NAME, "subsystem": SUBSYSTEM_NAME}
+        for trace_id, span_id, severity, index in zip(self.trace_ids, self.span_ids, self.severities, self.message_indexes):
+            yield {
+                "text": f"{self.timestamp}Z {LOG_MESSAGES[index]} trace_id={trace_id} span_id={span_id}",
+                "severity": severity,
+                "resource": dict(resource),
+                "attributes": {
+                    "trace_id": trace_id,
+                    "span_id": span_id
+                }
+            }
+
+    def encoded(self):
+        """Returns each log as UTF-8 JSON without building the intermediate dict."""
+        template = ENCODED_LOG_TEMPLATE
+        timestamp = self.timestamp
+        return [
+            (template % (timestamp, ENCODED_LOG_MESSAGES[index], trace_id, span_id, severity, trace_id, span_id)).encode("utf-8")
+            for trace_id, span_id, severity, index in zip(self.trace_ids, self.span_ids, self.severities, self.message_indexes)
+        ]
+
+    def columns(self):
+        """Returns the logs as {column: values} for TABLE_SCHEMA."""
+        n = len(self)
+        moment = datetime.fromisoformat(self.timestamp).replace(tzinfo=timezone.utc)
+        ids = self.id_bytes
+        step = ID_BYTES_PER_LOG
+        return {
+            "timestamp": [round(moment.timestamp() * 1e6)] * n,
+            "severity": self.severities,
+            "message": [LOG_MESSAGES[index] for index in self.message_indexes],
+            "trace_id": [ids[i:i + 16] for i in range(0, len(ids), step)],
+            "span_id": [ids[i + 16:i + step] for i in range(0, len(ids), step)],
+        }
+
+def generate_logs(n):
+    """Generates n log entries in bulk, returned in column form."""
+    return LogColumns(n)
+
+# === Entry source ===
+async def generate_entries(pace=True):
+    """Yields bursts of 5-15 logs when paced, or UNPACED_BURST_LOGS at a time otherwise."""
+    while True:
+        yield generate_logs(random.randint(5, 15) if pace else UNPACED_BURST_LOGS)
+
+        if pace:
+            # Sleep randomly between bursts to spread out the traffic and create variability
+            await asyncio.sleep(random.uniform(SLEEP_MIN_SECONDS, SLEEP_MAX_SECONDS))
+
+
 # === Main sending loop ===
+async def run(args):
+    sink = make_sink(args, ENVELOPE, ENTRIES_KEY, "logs", TABLE_SCHEMA, LogColumns.columns, signal="logs")
+    # Files are written as fast as logs can be generated.
+    entries = generate_entries(pace=not (args.no_pace or args.output))
+    await sink.consume(limit_entries(entries, args.max_entries))
+
+
 def main():
     """Generates and sends logs to Coralogix with a controlled rate."""
-    daily_sent_bytes = 0
-    start_time = time.time()
+    args = build_parser(main.__doc__, URL, TARGET_BYTES_PER_DAY).parse_args()
 
     print(f"Starting log generation. Target daily volume: {TARGET_BYTES_PER_DAY / 1024 / 1024:.2f} MB")
     print(f"Average wait time between batches: {AVERAGE_WAIT_SECONDS:.2f} seconds (range: {SLEEP_MIN_SECONDS:.2f} - {SLEEP_MAX_SECONDS:.2f} seconds)")
 
-    while True:
-        # Reset daily counter if a day has passed (approximately)
-        if time.time() - start_time >= SECONDS_PER_DAY:
-            daily_sent_bytes = 0
-            start_time = time.time()
-            print("\n--- New Day - Daily byte count reset ---")
-
-        # Randomize number of logs per batch (e.g., 5 to 15)
-        # Keep this range reasonable to avoid overly large single payloads
-        num_logs = random.randint(5, 15)
-        logs = [generate_log() for _ in range(num_logs)]
-
-        payload = {
-            "privateKey": PRIVATE_KEY,
-            "applicationName": APP_NAME,
-            "subsystemName": SUBSYSTEM_NAME,
-            "logEntries": logs
-        }
-
-        # Calculate actual batch size in bytes
-        try:
-            batch_payload_string = json.dumps(payload)
-            batch_size = len(batch_payload_string.encode('utf-8'))
-        except Exception as e:
-            print(f"Error calculating batch size: {e}. Skipping batch.")
-            # Sleep before next attempt to prevent rapid error looping
-            time.sleep(min(MIN_WAIT_SECONDS, 5)) # Sleep for a short time on error
-            continue
-
-
-        # Check if sending this batch would exceed the daily target
-        if daily_sent_bytes + batch_size > TARGET_BYTES_PER_DAY:
-            # Calculate remaining time in the day
-            elapsed_time_today = time.time() - start_time
-            remaining_time_today = max(0, SECONDS_PER_DAY - elapsed_time_today)
-
-            if remaining_time_today > 0:
-                 # If close to the limit, wait until the next day starts or for a longer period
-                print(f"Daily byte limit ({TARGET_BYTES_PER_DAY / 1024 / 1024:.2f} MB) approached. Sent {daily_sent_bytes / 1024 / 1024:.2f} MB so far.")
-                print(f"Waiting for {remaining_time_today:.2f} seconds until the next day starts.")
-                time.sleep(remaining_time_today + 5) # Wait until next day plus a buffer
-                daily_sent_bytes = 0 # Reset counter after waiting for the day to pass
-                start_time = time.time() # Reset start time
-                print("\n--- New Day - Daily byte count reset ---")
-                continue # Skip sending this batch and generate a new one for the new day
-            else:
-                 # If already past the day boundary but still exceeding the limit
-                 # (shouldn't happen with the reset logic, but as a safeguard)
-                print(f"Daily byte limit ({TARGET_BYTES_PER_DAY / 1024 / 1024:.2f} MB) exceeded. Sent {daily_sent_bytes / 1024 / 1024:.2f} MB.")
-                print("Waiting for a significant period before checking again.")
-                time.sleep(600) # Wait 10 minutes
-                continue
-
-
-        # Send logs
-        try:
-            response = requests.post(URL, json=payload, headers={"Content-Type": "application/json"})
-            print(f"Sent {num_logs} logs ({batch_size} bytes). Response: {response.status_code}. Total sent today: { (daily_sent_bytes + batch_size) / 1024:.2f} KB")
-            daily_sent_bytes += batch_size
-
-            # Check for non-200 responses and print error details
-            if response.status_code != 200:
-                print(f"Error sending logs. Status Code: {response.status_code}")
-                try:
-                    print(f"Response Body: {response.json()}")
-                except json.JSONDecodeError:
-                    print(f"Response Body: {response.text}")
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending logs: {e}")
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
-
-
-        # Sleep randomly between sends to spread out the traffic and create variability
-        sleep_seconds = random.uniform(SLEEP_MIN_SECONDS, SLEEP_MAX_SECONDS)
-        print(f"Sleeping for {sleep_seconds:.2f} seconds...")
-        time.sleep(sleep_seconds)
+    run_workers(run, args)
 
 
 if __name__ == "__main__":
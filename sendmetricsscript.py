@@ -1,104 +1,158 @@
-import requests
+import asyncio
 import random
 import time
-import json
-from datetime import datetime
 import socket
 
+from shipper.aggregation import WindowAggregator, add_aggregation_arguments, aggregate_entries
+from shipper.cli import build_parser, make_sink
+from shipper.series import SeriesSimulator, SeriesSpec
+from shipper.sinks import limit_entries
+from shipper.topology import Topology, add_topology_arguments
+from shipper.workers import run_workers
+
 # === CONFIG ===
 PRIVATE_KEY = "keygoeshere"  # Replace with your key
 APP_NAME = "k8s-infra-metrics"
 SUBSYSTEM_NAME = "production"
 METRICS_URL = "https://ng-api-http.cx498.coralogix.com/metrics"  # Metrics endpoint
+# Request body: these fields plus the batch under ENTRIES_KEY
+ENVELOPE = {
+    "application": APP_NAME,
+    "subsystem": SUBSYSTEM_NAME,
+}
+ENTRIES_KEY = "metrics"
 
 # === CONSTANTS ===
 TARGET_BYTES_PER_DAY = 1.5 * 1024 * 1024  # 1.5 MB/day
 ESTIMATED_AVG_METRIC_BYTE_SIZE = 300  # Smaller than logs (metrics are compact)
 TARGET_METRICS_PER_DAY = TARGET_BYTES_PER_DAY / ESTIMATED_AVG_METRIC_BYTE_SIZE
 SECONDS_PER_DAY = 24 * 60 * 60
-AVERAGE_METRICS_PER_BATCH = 10
-AVERAGE_WAIT_SECONDS = SECONDS_PER_DAY / (TARGET_METRICS_PER_DAY / AVERAGE_METRICS_PER_BATCH)
-MIN_WAIT_SECONDS = 10
-SLEEP_JITTER_SECONDS = AVERAGE_WAIT_SECONDS * 0.5
-SLEEP_MIN_SECONDS = max(MIN_WAIT_SECONDS, AVERAGE_WAIT_SECONDS - SLEEP_JITTER_SECONDS)
-SLEEP_MAX_SECONDS = AVERAGE_WAIT_SECONDS + SLEEP_JITTER_SECONDS
 
 # K8s/Docker Simulation Data
 K8S_NAMESPACES = ["default", "kube-system", "monitoring"]
 K8S_PODS = ["nginx-123", "redis-456", "app-backend-789"]
 NODES = ["node-1", "node-2"]
+# How each metric moves over time; every (metric, namespace, pod, node) series keeps its own state.
+METRIC_SPECS = {
+    "cpu_usage": SeriesSpec("gauge", mean=35, spread=8, low=0.1, high=99.9, reversion_seconds=300, seasonal=True),
+    "memory_usage": SeriesSpec("gauge", mean=55, spread=4, low=0.1, high=99.9, reversion_seconds=3600),
+    "network_bytes": SeriesSpec("counter", mean=50_000, spread=0.3, seasonal=True, digits=0),
+    "disk_io": SeriesSpec("counter", mean=200, spread=0.5, seasonal=True, digits=0),
+}
+COUNTER_METRICS = [name for name, spec in METRIC_SPECS.items() if spec.kind == "counter"]
+# Histogram buckets for --aggregate-mode histogram; both gauges are percentages.
+PERCENT_BUCKETS = (1, 5, 10, 25, 50, 75, 90, 95, 99, 100)
+HISTOGRAM_BUCKETS = {"cpu_usage": PERCENT_BUCKETS, "memory_usage": PERCENT_BUCKETS}
+# Default cluster: every pod above once in every namespace, one replica each.
+K8S_DEPLOYMENTS = [pod.rsplit("-", 1)[0] for pod in K8S_PODS]
+DEFAULT_DEPLOYMENTS = len(K8S_NAMESPACES) * len(K8S_DEPLOYMENTS)
+MIN_WAIT_SECONDS = 10
+# Labels that identify the emitting pod; with OTLP they become resource attributes.
+RESOURCE_LABELS = ("namespace", "pod", "node", "app", "subsystem")
 
 # === Metric Generators ===
-def generate_metrics_payload():
-    """Generates a batch of metrics in Coralogix format."""
-    timestamp = int(datetime.utcnow().timestamp() * 1000)  # Milliseconds
-    metrics = []
-    
-    for _ in range(random.randint(3, 8)):  # 3-8 metrics per batch
-        metric = {
-            "name": random.choice(["cpu_usage", "memory_usage", "network_bytes", "disk_io"]),
-            "value": round(random.uniform(0.1, 99.9), 2),
-            "timestamp": timestamp,
-            "labels": {
-                "namespace": random.choice(K8S_NAMESPACES),
-                "pod": random.choice(K8S_PODS),
-                "node": random.choice(NODES),
-                "app": APP_NAME,
-                "subsystem": SUBSYSTEM_NAME,
-            }
-        }
-        metrics.append(metric)
-    
+def build_topology(nodes=len(NODES), namespaces=len(K8S_NAMESPACES), deployments=DEFAULT_DEPLOYMENTS,
+                   pods=DEFAULT_DEPLOYMENTS, shard=0, shards=1):
+    """Returns the cluster (or a worker's share of its pods) to scrape; the default is the small demo cluster."""
+    return Topology(nodes, namespaces, deployments, pods, labels={"app": APP_NAME, "subsystem": SUBSYSTEM_NAME},
+                    namespace_names=K8S_NAMESPACES, deployment_names=K8S_DEPLOYMENTS, shard=shard, shards=shards)
+
+def scrape_wait_range(series):
+    """Returns the (min, max) seconds between scrapes of this many series that keep to the daily target."""
+    average = SECONDS_PER_DAY / (TARGET_METRICS_PER_DAY / series)
+    jitter = average * 0.5
+    return max(MIN_WAIT_SECONDS, average - jitter), average + jitter
+
+def generate_metrics_payload(simulator, targets):
+    """Generates one scrape of every series in Coralogix format."""
     return {
         "application": APP_NAME,
         "subsystem": SUBSYSTEM_NAME,
-        "metrics": metrics
+        "metrics": simulator.sample(targets, time.time())
+    }
+
+# === Entry Source ===
+# Columns written for --output .parquet/.arrow, as built by metric_columns().
+TABLE_SCHEMA = [
+    ("timestamp", "timestamp"),
+    ("name", "dictionary"),
+    ("value", "float64"),
+    ("labels", "map"),
+]
+
+def metric_columns(metrics):
+    """Returns a list of metrics as {column: values} for TABLE_SCHEMA."""
+    return {
+        "timestamp": [metric["timestamp"] * 1000 for metric in metrics],  # ms -> us
+        "name": [metric["name"] for metric in metrics],
+        "value": [metric["value"] for metric in metrics],
+        "labels": [metric["labels"] for metric in metrics],
     }
 
+async def generate_entries(topology, pace=True, churn=0.0, scrape_interval=0):
+    """Yields the metrics of one scrape at a time, in the same series order every scrape.
+
+    When paced, scrapes happen every scrape_interval seconds, or at random
+    intervals that keep to the daily target when it is 0.
+    """
+    simulator = SeriesSimulator(METRIC_SPECS)
+    wait_min, wait_max = scrape_wait_range(len(topology) * len(METRIC_SPECS))
+    next_scrape = time.monotonic()
+    while True:
+        yield generate_metrics_payload(simulator, topology.targets)["metrics"]
+        topology.churn(churn)
+
+        if pace and scrape_interval:
+            next_scrape += scrape_interval
+            await asyncio.sleep(max(0.0, next_scrape - time.monotonic()))
+        elif pace:
+            await asyncio.sleep(random.uniform(wait_min, wait_max))
+
 # === Main Sending Loop ===
+async def run(args):
+    headers = {
+        "Authorization": f"Bearer {PRIVATE_KEY}"  # Metrics API often uses Bearer auth
+    }
+    sink = make_sink(args, ENVELOPE, ENTRIES_KEY, "metrics", TABLE_SCHEMA, metric_columns, headers=headers,
+                     signal="metrics", resource_keys=RESOURCE_LABELS)
+    # Files are written as fast as metrics can be generated.
+    # With --workers each worker scrapes every N-th pod of the one cluster.
+    topology = build_topology(args.nodes, args.namespaces, args.deployments, args.pods,
+                              getattr(args, "worker_id", 0), max(getattr(args, "workers", 1), 1))
+    entries = generate_entries(topology, pace=not (args.no_pace or args.output), churn=args.churn,
+                               scrape_interval=args.scrape_interval)
+    if args.aggregate_window:
+        aggregator = WindowAggregator(args.aggregate_window, args.aggregate_mode, counters=COUNTER_METRICS,
+                                      buckets=HISTOGRAM_BUCKETS)
+        entries = aggregate_entries(entries, aggregator)
+    await sink.consume(limit_entries(entries, args.max_entries))
+
 def main():
-    daily_sent_bytes = 0
-    start_time = time.time()
+    """Generates and ships Kubernetes metrics to Coralogix with a controlled rate."""
+    parser = build_parser(main.__doc__, METRICS_URL, TARGET_BYTES_PER_DAY)
+    add_topology_arguments(parser, len(NODES), len(K8S_NAMESPACES), DEFAULT_DEPLOYMENTS, DEFAULT_DEPLOYMENTS)
+    parser.add_argument("--scrape-interval", type=float, default=0,
+                        help="seconds between scrapes, 0 to pace them to the daily target (default: %(default)s)")
+    add_aggregation_arguments(parser)
+    args = parser.parse_args()
+    if not 1 <= args.namespaces <= args.deployments <= args.pods or args.nodes < 1:
+        parser.error("need --nodes >= 1 and 1 <= --namespaces <= --deployments <= --pods")
+    if args.pods < args.workers:
+        parser.error("need at least one pod per worker")
+    if args.aggregate_window < 0:
+        parser.error("--aggregate-window must not be negative")
 
+    series = args.pods * len(METRIC_SPECS)
     print(f"Starting metrics shipping. Target: {TARGET_BYTES_PER_DAY / 1024 / 1024:.2f} MB/day")
-    print(f"Avg wait between batches: {AVERAGE_WAIT_SECONDS:.2f}s")
+    print(f"Series per scrape: {series} ({args.pods} pods on {args.nodes} nodes, {len(METRIC_SPECS)} metrics each)")
+    if args.scrape_interval:
+        print(f"Scrape interval: {args.scrape_interval:.2f}s")
+    else:
+        print(f"Avg wait between batches: {sum(scrape_wait_range(series)) / 2:.2f}s")
+    if args.aggregate_window:
+        print(f"Aggregating samples over {args.aggregate_window:g}s windows ({args.aggregate_mode})")
 
-    while True:
-        if time.time() - start_time >= SECONDS_PER_DAY:
-            daily_sent_bytes = 0
-            start_time = time.time()
-            print("\n--- New Day: Reset Daily Byte Count ---")
-
-        payload = generate_metrics_payload()
-        
-        try:
-            batch_size = len(json.dumps(payload).encode('utf-8'))
-        except Exception as e:
-            print(f"Error calculating batch size: {e}")
-            time.sleep(5)
-            continue
-
-        if daily_sent_bytes + batch_size > TARGET_BYTES_PER_DAY:
-            remaining_time = max(0, SECONDS_PER_DAY - (time.time() - start_time))
-            print(f"Approaching daily limit. Waiting {remaining_time:.2f}s.")
-            time.sleep(remaining_time + 5)
-            daily_sent_bytes = 0
-            start_time = time.time()
-            continue
-
-        try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {PRIVATE_KEY}"  # Metrics API often uses Bearer auth
-            }
-            response = requests.post(METRICS_URL, json=payload, headers=headers)
-            print(f"Shipped {len(payload['metrics'])} metrics ({batch_size} bytes). Status: {response.status_code}")
-            daily_sent_bytes += batch_size
-        except Exception as e:
-            print(f"Shipping failed: {e}")
-
-        sleep_time = random.uniform(SLEEP_MIN_SECONDS, SLEEP_MAX_SECONDS)
-        time.sleep(sleep_time)
+    run_workers(run, args)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,28 @@
+"""Shared shipping pipeline for the Coralogix sender scripts."""
+from shipper.batching import BatchAccumulator, accumulate
+from shipper.compression import Compressor, make_compressor
+from shipper.engine import ShippingEngine
+from shipper.payload import PayloadBuilder, encode_entry
+from shipper.ratelimit import DailyCap, RateController, TokenBucket
+from shipper.retry import CircuitBreaker, RetryPolicy
+from shipper.spool import Spool
+from shipper.stats import LatencyHistogram, ShipperStats, merge_snapshots
+
+__all__ = [
+    "BatchAccumulator",
+    "CircuitBreaker",
+    "Compressor",
+    "DailyCap",
+    "LatencyHistogram",
+    "PayloadBuilder",
+    "RateController",
+    "RetryPolicy",
+    "ShipperStats",
+    "ShippingEngine",
+    "Spool",
+    "TokenBucket",
+    "accumulate",
+    "encode_entry",
+    "make_compressor",
+    "merge_snapshots",
+]
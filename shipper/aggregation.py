@@ -0,0 +1,152 @@
+"""Pre-aggregation of metric samples over fixed time windows.
+
+Samples of the same series (name plus labels) that fall into one window are
+merged and emitted when the window closes, so a source scraped every second
+sends one summary per series per window instead of every point. Windows are
+aligned to multiples of the window length in sample time.
+
+- Counters keep their last sample, which loses nothing a rate() needs.
+- Gauges become NAME_min, NAME_max, NAME_sum and NAME_count in "stats"
+  mode, or a Prometheus-style histogram in "histogram" mode: cumulative
+  NAME_bucket series with an "le" label, plus NAME_sum and NAME_count.
+
+Summaries carry the timestamp of the series' last sample in the window.
+"""
+import bisect
+
+# === CONSTANTS ===
+MODES = ("stats", "histogram")
+# Histogram bucket upper bounds for gauges without their own; +Inf is added.
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class _SeriesWindow:
+    """One series' samples within the current window."""
+
+    def __init__(self, name, labels, bounds):
+        self.name = name
+        self.labels = labels
+        self.count = 0
+        self.sum = 0.0
+        self.min = self.max = self.last = None
+        self.timestamp = None
+        self.bounds = bounds
+        self.buckets = [0] * len(bounds) if bounds else None
+
+    def add(self, value, timestamp):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.last = value
+        self.timestamp = timestamp
+        if self.buckets is not None:
+            index = bisect.bisect_left(self.bounds, value)
+            if index < len(self.buckets):
+                self.buckets[index] += 1
+
+
+class WindowAggregator:
+    """Merges metric entries per series over windows of window_seconds.
+
+    counters names the metrics that are monotonic counters. buckets maps
+    gauge names to histogram bounds for "histogram" mode.
+    """
+
+    def __init__(self, window_seconds, mode="stats", counters=(), buckets=None):
+        if window_seconds <= 0:
+            raise ValueError("the aggregation window must be positive")
+        if mode not in MODES:
+            raise ValueError(f"unknown aggregation mode: {mode}")
+        self.window_ms = int(window_seconds * 1000)
+        self.mode = mode
+        self.counters = frozenset(counters)
+        self.buckets = dict(buckets or {})
+        self._window_start = None
+        self._series = {}
+
+    def __len__(self):
+        return len(self._series)
+
+    def _bounds(self, name):
+        if self.mode != "histogram" or name in self.counters:
+            return None
+        return tuple(self.buckets.get(name, DEFAULT_BUCKETS))
+
+    def add(self, entry):
+        """Fold in one sample; returns the summaries of the window it closed, if any.
+
+        Samples older than the current window are counted in it.
+        """
+        timestamp = entry["timestamp"]
+        start = timestamp - timestamp % self.window_ms
+        closed = []
+        if self._window_start is None:
+            self._window_start = start
+        elif start > self._window_start:
+            closed = self.flush()
+            self._window_start = start
+        name, labels = entry["name"], entry.get("labels") or {}
+        key = (name, tuple(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _SeriesWindow(name, labels, self._bounds(name))
+        series.add(entry["value"], timestamp)
+        return closed
+
+    def flush(self):
+        """Summaries of every series in the current window, in first-seen order; starts a new window."""
+        entries = []
+        for series in self._series.values():
+            entries.extend(self._summarize(series))
+        self._series = {}
+        return entries
+
+    def _summarize(self, series):
+        def entry(name, value, labels=series.labels):
+            return {"name": name, "value": value, "timestamp": series.timestamp, "labels": labels}
+
+        if series.name in self.counters:
+            return [entry(series.name, series.last)]
+        total = round(series.sum, 6)
+        if self.mode == "stats":
+            return [
+                entry(f"{series.name}_min", series.min),
+                entry(f"{series.name}_max", series.max),
+                entry(f"{series.name}_sum", total),
+                entry(f"{series.name}_count", series.count),
+            ]
+        summaries = []
+        cumulative = 0
+        for bound, count in zip(series.bounds, series.buckets):
+            cumulative += count
+            summaries.append(entry(f"{series.name}_bucket", cumulative, {**series.labels, "le": f"{bound:g}"}))
+        summaries.append(entry(f"{series.name}_bucket", series.count, {**series.labels, "le": "+Inf"}))
+        summaries.append(entry(f"{series.name}_sum", total))
+        summaries.append(entry(f"{series.name}_count", series.count))
+        return summaries
+
+
+async def aggregate_entries(chunks, aggregator):
+    """Pass metric chunks through aggregator; yields the summaries of each closed window.
+
+    The window still open when chunks end is flushed as well.
+    """
+    async for chunk in chunks:
+        closed = []
+        for entry in chunk:
+            closed.extend(aggregator.add(entry))
+        if closed:
+            yield closed
+    remaining = aggregator.flush()
+    if remaining:
+        yield remaining
+
+
+def add_aggregation_arguments(parser):
+    """Add the --aggregate-* options to a metrics sender's ArgumentParser."""
+    parser.add_argument("--aggregate-window", type=float, default=0,
+                        help="merge samples per series over windows of this many seconds, 0 sends every sample "
+                             "(default: %(default)s)")
+    parser.add_argument("--aggregate-mode", choices=MODES, default="stats",
+                        help="summarize gauges as min/max/sum/count or as a histogram (default: %(default)s)")
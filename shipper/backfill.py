@@ -0,0 +1,121 @@
+"""Historical backfill: event timestamps spread over a past time range.
+
+Event counts per minute follow a diurnal and a weekly curve around a mean
+rate, so generated history has busy afternoons, quiet nights and quieter
+weekends. The whole range is produced as fast as the sink allows rather
+than in real time.
+"""
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+# === CONSTANTS ===
+SLOT_SECONDS = 60
+# Most timestamps handed out per chunk; busy slots are split into several chunks.
+MAX_CHUNK_EVENTS = 1000
+SECONDS_PER_DAY = 24 * 60 * 60
+# Relative traffic per UTC hour, from the overnight trough to the mid-afternoon peak.
+HOURLY_PROFILE = (0.30, 0.25, 0.22, 0.20, 0.22, 0.30, 0.45, 0.70, 1.00, 1.30, 1.50, 1.60,
+                  1.55, 1.60, 1.70, 1.65, 1.50, 1.30, 1.05, 0.85, 0.70, 0.55, 0.45, 0.36)
+# Relative traffic per weekday, Monday first.
+WEEKDAY_PROFILE = (1.10, 1.15, 1.15, 1.10, 1.00, 0.55, 0.45)
+# 1970-01-01 was a Thursday.
+EPOCH_WEEKDAY = 3
+
+
+def _normalized(profile):
+    mean = sum(profile) / len(profile)
+    return tuple(value / mean for value in profile)
+
+
+HOURLY_MULTIPLIERS = _normalized(HOURLY_PROFILE)
+WEEKDAY_MULTIPLIERS = _normalized(WEEKDAY_PROFILE)
+
+
+def rate_multiplier(timestamp):
+    """Traffic at a UTC epoch timestamp relative to the mean, interpolated between hours."""
+    hour = (timestamp % SECONDS_PER_DAY) / 3600
+    index = int(hour)
+    fraction = hour - index
+    hourly = HOURLY_MULTIPLIERS[index] * (1 - fraction) + HOURLY_MULTIPLIERS[(index + 1) % 24] * fraction
+    weekday = (int(timestamp // SECONDS_PER_DAY) + EPOCH_WEEKDAY) % 7
+    return hourly * WEEKDAY_MULTIPLIERS[weekday]
+
+
+def poisson(mean):
+    """Poisson-distributed count; normal approximation for large means."""
+    if mean <= 0:
+        return 0
+    if mean > 30:
+        return max(0, round(random.gauss(mean, math.sqrt(mean))))
+    limit = math.exp(-mean)
+    count, product = 0, random.random()
+    while product > limit:
+        count += 1
+        product *= random.random()
+    return count
+
+
+def event_times(start, end, mean_rate, shard=0, shards=1, slot_seconds=SLOT_SECONDS, max_chunk=MAX_CHUNK_EVENTS):
+    """Yields sorted lists of epoch timestamps covering [start, end).
+
+    mean_rate is events per second of simulated time, averaged over a week.
+    With shards > 1 only every shards-th slot, offset by shard, is produced,
+    so workers can split one range between them.
+    """
+    for index, slot_start in enumerate(range(int(start), int(end), slot_seconds)):
+        if index % shards != shard:
+            continue
+        slot_end = min(slot_start + slot_seconds, end)
+        count = poisson(mean_rate * (slot_end - slot_start) * rate_multiplier(slot_start))
+        times = sorted(random.uniform(slot_start, slot_end) for _ in range(count))
+        for offset in range(0, count, max_chunk):
+            yield times[offset:offset + max_chunk]
+
+
+def iso_timestamp(timestamp):
+    """ISO-8601 UTC time with a trailing Z, as CloudTrail and the log texts use.
+
+    Microseconds are always written so the strings sort in time order.
+    """
+    return iso_timestamps([timestamp])[0]
+
+
+def iso_timestamps(timestamps):
+    """iso_timestamp() for many timestamps, formatting each distinct second once."""
+    stamps = []
+    second = prefix = None
+    for timestamp in timestamps:
+        whole = int(timestamp)
+        if whole != second:
+            second = whole
+            prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(whole))
+        stamps.append(f"{prefix}.{min(int((timestamp - whole) * 1e6), 999999):06d}Z")
+    return stamps
+
+
+def parse_end(value):
+    """Parse --backfill-end; empty means now."""
+    if not value:
+        return time.time()
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def add_backfill_arguments(parser, default_rate):
+    """Add the --backfill-* options to a sender's ArgumentParser."""
+    parser.add_argument("--backfill-days", type=float, default=0,
+                        help="generate this many days of history ending at --backfill-end instead of live events")
+    parser.add_argument("--backfill-end", default="",
+                        help="end of the backfill range as ISO-8601, UTC unless stated (default: now)")
+    parser.add_argument("--backfill-rate", type=float, default=default_rate,
+                        help="mean events per simulated second over a week (default: %(default).4g)")
+
+
+def backfill_range(args):
+    """(start, end) epoch seconds of the range selected on the command line."""
+    end = parse_end(args.backfill_end)
+    return end - timedelta(days=args.backfill_days).total_seconds(), end
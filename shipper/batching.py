@@ -0,0 +1,138 @@
+"""Size- and age-triggered batching for the sender scripts.
+
+Entries are appended to a BatchAccumulator, which flushes once the payload
+would outgrow the ingress request limit or once its oldest entry has waited
+max_linger seconds, whichever comes first.
+"""
+import asyncio
+import time
+
+from shipper.payload import PayloadBuilder, encode_entry
+
+# === CONSTANTS ===
+# Coralogix ingress rejects requests above 2 MB; flush a little below that.
+INGRESS_MAX_REQUEST_BYTES = 2 * 1024 * 1024
+DEFAULT_MAX_BATCH_BYTES = int(INGRESS_MAX_REQUEST_BYTES * 0.95)
+DEFAULT_MAX_LINGER_SECONDS = 5.0
+# Chunks of entries buffered between the generator and the batcher.
+QUEUE_DEPTH = 64
+
+_END = object()
+_TIMED_OUT = object()
+
+
+class BatchAccumulator:
+    """Collects entries under envelope[entries_key] as a pre-serialized payload."""
+
+    def __init__(self, envelope, entries_key, max_bytes=DEFAULT_MAX_BATCH_BYTES,
+                 max_linger=DEFAULT_MAX_LINGER_SECONDS):
+        self.max_bytes = max_bytes
+        self.max_linger = max_linger
+        self._builder = PayloadBuilder(envelope, entries_key)
+        self.opened_at = None
+
+    def __len__(self):
+        return len(self._builder)
+
+    @property
+    def size(self):
+        return self._builder.size
+
+    def add(self, entry):
+        """Encode and append entry; return the list of batches that became ready."""
+        return self.add_encoded(encode_entry(entry))
+
+    def add_encoded(self, encoded):
+        """Append an entry already encoded with encode_entry()."""
+        builder = self._builder
+        ready = []
+        if builder.count and builder.size + builder.cost(encoded) > self.max_bytes:
+            ready.append(self.flush())
+        if not builder.count:
+            self.opened_at = time.monotonic()
+        builder.append(encoded)
+        if builder.size >= self.max_bytes:
+            ready.append(self.flush())
+        return ready
+
+    def time_left(self):
+        """Seconds until the linger deadline, or None when empty."""
+        if not self._builder.count:
+            return None
+        return max(0.0, self.opened_at + self.max_linger - time.monotonic())
+
+    def flush(self):
+        """Return (body, entry_count) for the current batch and start a new one."""
+        count = self._builder.count
+        self.opened_at = None
+        return self._builder.finish(), count
+
+
+async def _pump(chunks, queue):
+    try:
+        async for chunk in chunks:
+            await queue.put(chunk)
+    except Exception as e:
+        await queue.put(e)
+        return
+    await queue.put(_END)
+
+
+async def _next_chunk(queue, timeout):
+    """Return the next chunk, or _TIMED_OUT once timeout seconds pass.
+
+    asyncio.wait is used instead of wait_for, which on older Pythons can
+    swallow a cancellation that arrives as the get() completes.
+    """
+    try:
+        return queue.get_nowait()
+    except asyncio.QueueEmpty:
+        pass
+    getter = asyncio.ensure_future(queue.get())
+    try:
+        done, _ = await asyncio.wait({getter}, timeout=timeout)
+    except asyncio.CancelledError:
+        getter.cancel()
+        raise
+    if getter in done:
+        return getter.result()
+    getter.cancel()
+    return _TIMED_OUT
+
+
+async def accumulate(chunks, accumulator):
+    """Turn an async iterable of entry lists into (body, count) batches.
+
+    A chunk may instead expose encoded(), returning entries already encoded
+    as JSON bytes, which skips per-entry serialization when the accumulator
+    takes them through add_encoded().
+
+    Batches are yielded as soon as they fill up or their linger time runs out,
+    and whatever is left is flushed when chunks is exhausted.
+    """
+    queue = asyncio.Queue(maxsize=QUEUE_DEPTH)
+    producer = asyncio.create_task(_pump(chunks, queue))
+    try:
+        while True:
+            if accumulator.time_left() == 0:
+                yield accumulator.flush()
+            chunk = await _next_chunk(queue, accumulator.time_left())
+            if chunk is _TIMED_OUT:
+                continue
+            if chunk is _END:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            # Chunks with an encoded() method hand over ready-made JSON entries.
+            if hasattr(chunk, "encoded") and hasattr(accumulator, "add_encoded"):
+                add, entries = accumulator.add_encoded, chunk.encoded()
+            else:
+                add, entries = accumulator.add, chunk
+            for entry in entries:
+                for batch in add(entry):
+                    yield batch
+        if len(accumulator):
+            yield accumulator.flush()
+        await producer
+    finally:
+        producer.cancel()
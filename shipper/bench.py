@@ -0,0 +1,360 @@
+"""Benchmarks for the shipper pipeline stages.
+
+Measures each stage on its own (generation, serialization, compression, HTTP
+post) and end to end against a mock ingress running in a child process.
+Results can be written as JSON and compared with an earlier run:
+
+    python -m shipper.bench --output bench.json
+    python -m shipper.bench --compare bench.json
+
+Run from the repository root so the sender scripts are importable.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+
+import cloudtrailintegration
+import senddatatocoralogix
+import sendmetricsscript
+from shipper.batching import BatchAccumulator, accumulate
+from shipper.compression import Compressor
+from shipper.engine import ShippingEngine
+from shipper.mockingress import MockIngress
+from shipper.payload import PayloadBuilder, encode_entry
+from shipper.remotewrite import RemoteWriteAccumulator
+from shipper.series import SeriesSimulator
+
+# === CONSTANTS ===
+DEFAULT_DURATION_SECONDS = 3.0
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+# Entries per call for the bulk and serialization stages.
+CHUNK = 1000
+E2E_MAX_IN_FLIGHT = 16
+
+# name -> (script module, ingress path)
+SCRIPTS = {
+    "logs": (senddatatocoralogix, "/api/v1/logs"),
+    "cloudtrail": (cloudtrailintegration, "/api/v1/logs"),
+    "metrics": (sendmetricsscript, "/metrics"),
+}
+
+CPU_STAGES = ("generate_log", "generate_logs_bulk", "generate_cloudtrail_event", "generate_cloudtrail_bulk",
+              "generate_metrics_payload", "serialize_logs", "serialize_cloudtrail", "serialize_metrics",
+              "serialize_remote_write", "compress_gzip", "compress_zstd")
+NETWORK_STAGES = ("http_post",) + tuple(f"e2e_{script}" for script in SCRIPTS)
+
+
+def rss_bytes():
+    """Current resident set size, falling back to the peak where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(step, duration):
+    """Call step() repeatedly for duration seconds; step returns (events, bytes)."""
+    events = nbytes = calls = 0
+    started = time.perf_counter()
+    deadline = started + duration
+    while time.perf_counter() < deadline:
+        e, b = step()
+        events += e
+        nbytes += b
+        calls += 1
+    elapsed = time.perf_counter() - started
+    return {
+        "calls": calls,
+        "events": events,
+        "bytes": nbytes,
+        "elapsed_seconds": elapsed,
+        "events_per_second": events / elapsed,
+        "bytes_per_second": nbytes / elapsed,
+        "rss_bytes": rss_bytes(),
+    }
+
+
+# === Stage steps ===
+def _generate_log():
+    senddatatocoralogix.generate_log()
+    return 1, 0
+
+
+def _generate_logs_bulk():
+    return len(senddatatocoralogix.generate_logs(CHUNK).encoded()), 0
+
+
+def _generate_cloudtrail_event():
+    cloudtrailintegration.generate_cloudtrail_event()
+    return 1, 0
+
+
+def _generate_cloudtrail_bulk():
+    return len(cloudtrailintegration.generate_cloudtrail_events(CHUNK).encoded()), 0
+
+
+def _generate_metrics_payload():
+    simulator = SeriesSimulator(sendmetricsscript.METRIC_SPECS)
+    targets = sendmetricsscript.build_topology().targets
+
+    def step():
+        return len(sendmetricsscript.generate_metrics_payload(simulator, targets)["metrics"]), 0
+    return step
+
+
+def _serialize(entries, envelope, entries_key):
+    builder = PayloadBuilder(envelope, entries_key)
+
+    def step():
+        for entry in entries:
+            builder.append(encode_entry(entry))
+        body = builder.finish()
+        return len(entries), len(body)
+    return step
+
+
+def _serialize_remote_write(entries):
+    accumulator = RemoteWriteAccumulator(max_bytes=float("inf"), max_linger=0)
+
+    def step():
+        for entry in entries:
+            accumulator.add(entry)
+        body, count = accumulator.flush()
+        return count, len(body)
+    return step
+
+
+def _compress(body, encoding):
+    compressor = Compressor(encoding)
+
+    def step():
+        compressor.compress(body)
+        return 0, len(body)
+    return step
+
+
+def _cloudtrail_body():
+    """One CHUNK-event CloudTrail request body, the input for the compression and post stages."""
+    builder = PayloadBuilder(cloudtrailintegration.ENVELOPE, cloudtrailintegration.ENTRIES_KEY)
+    for _ in range(CHUNK):
+        builder.append(encode_entry(cloudtrailintegration.generate_cloudtrail_event()))
+    return builder.finish()
+
+
+def stage_steps():
+    """Map of stage name to a zero-argument step function for the CPU-only stages."""
+    logs = [senddatatocoralogix.generate_log() for _ in range(CHUNK)]
+    cloudtrail = [cloudtrailintegration.generate_cloudtrail_event() for _ in range(CHUNK)]
+    simulator = SeriesSimulator(sendmetricsscript.METRIC_SPECS)
+    targets = sendmetricsscript.build_topology().targets
+    metrics = []
+    while len(metrics) < CHUNK:
+        metrics.extend(sendmetricsscript.generate_metrics_payload(simulator, targets)["metrics"])
+    body = _cloudtrail_body()
+    return {
+        "generate_log": _generate_log,
+        "generate_logs_bulk": _generate_logs_bulk,
+        "generate_cloudtrail_event": _generate_cloudtrail_event,
+        "generate_cloudtrail_bulk": _generate_cloudtrail_bulk,
+        "generate_metrics_payload": _generate_metrics_payload(),
+        "serialize_logs": _serialize(logs, senddatatocoralogix.ENVELOPE, senddatatocoralogix.ENTRIES_KEY),
+        "serialize_cloudtrail": _serialize(cloudtrail, cloudtrailintegration.ENVELOPE, cloudtrailintegration.ENTRIES_KEY),
+        "serialize_metrics": _serialize(metrics, sendmetricsscript.ENVELOPE, sendmetricsscript.ENTRIES_KEY),
+        "serialize_remote_write": _serialize_remote_write(metrics),
+        "compress_gzip": _compress(body, "gzip"),
+        "compress_zstd": _compress(body, "zstd"),
+    }
+
+
+# === Network stages ===
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve_mock(port, ready):
+    async def serve():
+        ingress = MockIngress()
+        await ingress.start("127.0.0.1", port)
+        ready.set()
+        await asyncio.Event().wait()
+    asyncio.run(serve())
+
+
+async def _time_limited(chunks, duration):
+    deadline = time.monotonic() + duration
+    async for chunk in chunks:
+        yield chunk
+        if time.monotonic() >= deadline:
+            return
+
+
+def _engine_result(engine, started):
+    elapsed = time.perf_counter() - started
+    stats = engine.stats
+    return {
+        "batches": stats.batches_sent,
+        "events": stats.events_sent,
+        "bytes": stats.bytes_sent,
+        "errors": stats.errors,
+        "elapsed_seconds": elapsed,
+        "events_per_second": stats.events_sent / elapsed,
+        "bytes_per_second": stats.bytes_sent / elapsed,
+        "latency_p50": stats.latency.quantile(0.50),
+        "latency_p99": stats.latency.quantile(0.99),
+        "rss_bytes": rss_bytes(),
+    }
+
+
+async def bench_http_post(base_url, duration):
+    """Post one pre-built CloudTrail batch over and over."""
+    body = _cloudtrail_body()
+    async with ShippingEngine(base_url + "/api/v1/logs", max_in_flight=E2E_MAX_IN_FLIGHT, verbose=False) as engine:
+        started = time.perf_counter()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            await engine.submit(body, CHUNK)
+        await engine.drain()
+        return _engine_result(engine, started)
+
+
+def _script_entries(module):
+    """The script's unpaced entry source; the metrics script scrapes its default cluster."""
+    if module is sendmetricsscript:
+        return module.generate_entries(sendmetricsscript.build_topology(), pace=False)
+    return module.generate_entries(pace=False)
+
+
+async def bench_end_to_end(name, base_url, duration):
+    """Script generator -> accumulator -> engine -> mock ingress."""
+    module, path = SCRIPTS[name]
+    accumulator = BatchAccumulator(module.ENVELOPE, module.ENTRIES_KEY)
+    async with ShippingEngine(base_url + path, max_in_flight=E2E_MAX_IN_FLIGHT, verbose=False) as engine:
+        started = time.perf_counter()
+        await engine.run(accumulate(_time_limited(_script_entries(module), duration), accumulator))
+        return _engine_result(engine, started)
+
+
+def run_network_stages(selected, duration):
+    results = {}
+    names = [name for name in NETWORK_STAGES if name in selected]
+    if not names:
+        return results
+    port = _free_port()
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    server = context.Process(target=_serve_mock, args=(port, ready), daemon=True)
+    server.start()
+    try:
+        if not ready.wait(30):
+            raise RuntimeError("mock ingress did not start")
+        base_url = f"http://127.0.0.1:{port}"
+        for name in names:
+            if name == "http_post":
+                results[name] = asyncio.run(bench_http_post(base_url, duration))
+            else:
+                results[name] = asyncio.run(bench_end_to_end(name[len("e2e_"):], base_url, duration))
+            _print_result(name, results[name])
+    finally:
+        server.terminate()
+        server.join()
+    return results
+
+
+# === Reporting ===
+def all_stage_names():
+    return CPU_STAGES + NETWORK_STAGES
+
+
+def _print_result(name, result):
+    line = f"{name:28s} {result['events_per_second']:>12,.0f} events/s {result['bytes_per_second'] / 1e6:>9.2f} MB/s"
+    if "latency_p50" in result:
+        line += f"  p50={result['latency_p50'] * 1000:.1f}ms p99={result['latency_p99'] * 1000:.1f}ms"
+    line += f"  rss={result['rss_bytes'] / 1e6:.0f}MB"
+    print(line)
+
+
+def compare(current, baseline, threshold):
+    """Print per-stage changes against baseline; returns the regressed stage names."""
+    regressions = []
+    for name, result in current["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if not before:
+            continue
+        metric = "events_per_second" if before["events_per_second"] else "bytes_per_second"
+        if not before[metric]:
+            continue
+        change = result[metric] / before[metric] - 1
+        flag = ""
+        if change < -threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:28s} {metric:18s} {change:+7.1%}{flag}")
+    return regressions
+
+
+def run_benchmarks(selected, duration):
+    results = {}
+    steps = stage_steps() if selected & set(CPU_STAGES) else {}
+    for name, step in steps.items():
+        if name in selected:
+            results[name] = measure(step, duration)
+            _print_result(name, results[name])
+    results.update(run_network_stages(selected, duration))
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "duration_seconds": duration,
+        },
+        "stages": results,
+    }
+
+
+def main():
+    """Benchmarks the shipper pipeline stages."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION_SECONDS,
+                        help="seconds per stage (default: %(default)s)")
+    parser.add_argument("--stages", nargs="+", default=None, metavar="STAGE",
+                        help=f"stages to run (default: all of {', '.join(all_stage_names())})")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare against results from an earlier --output")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="slowdown fraction reported as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    selected = set(args.stages or all_stage_names())
+    unknown = selected - set(all_stage_names())
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    report = run_benchmarks(selected, args.duration)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed by more than {args.threshold:.0%}.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Command-line options shared by the sender scripts."""
+import argparse
+
+from shipper import otlp, remotewrite, sinks
+from shipper.batching import DEFAULT_MAX_BATCH_BYTES, DEFAULT_MAX_LINGER_SECONDS, BatchAccumulator
+from shipper.compression import ENCODINGS, Compressor, make_compressor
+from shipper.engine import DEFAULT_MAX_IN_FLIGHT, DEFAULT_REPLAY_RATE
+from shipper.exporter import DEFAULT_HOST as DEFAULT_METRICS_HOST
+from shipper.ratelimit import RateController
+from shipper.retry import DEFAULT_MAX_ATTEMPTS, DEFAULT_MAX_DELAY_SECONDS, RetryPolicy
+from shipper.spool import Spool
+
+# === CONSTANTS ===
+PROTOCOLS = ("coralogix", "otlp-http", "otlp-grpc", "remote-write")
+
+
+def _output_path(value):
+    try:
+        file_format = sinks.output_format(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    if file_format in ("parquet", "arrow") and sinks.pyarrow is None:
+        raise argparse.ArgumentTypeError(f"{file_format} output needs the pyarrow package")
+    return value
+
+
+def build_parser(description, default_url, default_daily_bytes):
+    """Return an ArgumentParser carrying the common shipping options."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.set_defaults(default_url=default_url)
+    parser.add_argument("--url", default=None,
+                        help=f"ingress endpoint (default: {default_url}, or the local collector or Prometheus "
+                             "for the other protocols)")
+    parser.add_argument("--protocol", choices=PROTOCOLS, default="coralogix",
+                        help="coralogix JSON, OTLP protobuf over HTTP or gRPC, or Prometheus remote-write for metrics; "
+                             "OTLP needs opentelemetry-proto, gRPC needs grpcio and remote-write needs cramjam or "
+                             "python-snappy (default: %(default)s)")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="concurrent requests allowed (default: %(default)s)")
+    parser.add_argument("--daily-bytes", type=float, default=default_daily_bytes,
+                        help="byte cap per UTC day, 0 disables it (default: %(default)s)")
+    parser.add_argument("--bytes-per-second", type=float, default=0,
+                        help="target byte rate, 0 for unlimited (default: %(default)s)")
+    parser.add_argument("--events-per-second", type=float, default=0,
+                        help="target event rate, 0 for unlimited (default: %(default)s)")
+    parser.add_argument("--max-batch-bytes", type=int, default=DEFAULT_MAX_BATCH_BYTES,
+                        help="flush a batch once it reaches this many bytes (default: %(default)s)")
+    parser.add_argument("--linger", type=float, default=DEFAULT_MAX_LINGER_SECONDS,
+                        help="flush a batch once its oldest entry is this old, in seconds (default: %(default)s)")
+    parser.add_argument("--compression", choices=ENCODINGS, default="none",
+                        help="Content-Encoding for request bodies; zstd needs the zstandard package, snappy is "
+                             "remote-write only and needs cramjam or python-snappy (default: %(default)s)")
+    parser.add_argument("--compression-level", type=int, default=None,
+                        help="compression level (default: 6 for gzip, 3 for zstd)")
+    parser.add_argument("--budget-on", choices=("raw", "wire"), default="raw",
+                        help="charge byte limits on uncompressed or compressed bytes (default: %(default)s)")
+    parser.add_argument("--spool-dir", default=None,
+                        help="write batches to this directory before sending and replay failures from it")
+    parser.add_argument("--replay-rate", type=float, default=DEFAULT_REPLAY_RATE,
+                        help="spooled batches replayed per second after an outage (default: %(default)s)")
+    parser.add_argument("--spool-fsync", action="store_true",
+                        help="fsync every spool write instead of relying on the page cache")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help="attempts per batch on retryable errors such as 429 and 503; without --spool-dir "
+                             "the batch is discarded once they run out (default: %(default)s)")
+    parser.add_argument("--max-backoff", type=float, default=DEFAULT_MAX_DELAY_SECONDS,
+                        help="cap on the backoff between attempts, in seconds (default: %(default)s)")
+    parser.add_argument("--no-pace", action="store_true",
+                        help="generate entries back to back instead of sleeping between bursts")
+    parser.add_argument("--quiet", action="store_true",
+                        help="do not print a line per batch")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="serve shipper stats for Prometheus at /metrics on this port, 0 for off (default: %(default)s)")
+    parser.add_argument("--metrics-host", default=DEFAULT_METRICS_HOST,
+                        help="address the --metrics-port endpoint listens on (default: %(default)s)")
+    parser.add_argument("--output", type=_output_path, default=None,
+                        help="write entries to a .ndjson, .ndjson.gz, .parquet or .arrow (Arrow IPC) file instead of the ingress")
+    parser.add_argument("--row-group-rows", type=int, default=sinks.DEFAULT_ROW_GROUP_ROWS,
+                        help="rows per Parquet row group or Arrow record batch (default: %(default)s)")
+    parser.add_argument("--max-entries", type=int, default=0,
+                        help="stop after about this many entries, split across --workers, 0 for no limit "
+                             "(default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="generator/shipper processes, each with 1/N of the rate limits (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="base RNG seed; worker i uses seed + i (default: random)")
+    return parser
+
+
+def engine_options(args):
+    """Translate parsed arguments into ShippingEngine keyword arguments."""
+    if args.compression == "snappy" and getattr(args, "protocol", "coralogix") != "remote-write":
+        # Only the remote-write endpoint accepts a snappy Content-Encoding.
+        raise SystemExit("--compression snappy is only supported with --protocol remote-write.")
+    return {
+        "max_in_flight": args.max_in_flight,
+        "rate_controller": RateController(
+            bytes_per_second=args.bytes_per_second,
+            events_per_second=args.events_per_second,
+            daily_bytes=args.daily_bytes,
+        ),
+        "verbose": not args.quiet,
+        "compressor": make_compressor(args.compression, args.compression_level),
+        "budget_on": args.budget_on,
+        "spool": Spool(args.spool_dir, fsync=args.spool_fsync) if args.spool_dir else None,
+        "replay_rate": args.replay_rate,
+        "retry_policy": RetryPolicy(max_attempts=args.max_attempts, max_delay=args.max_backoff),
+        "stats_reporter": getattr(args, "stats_reporter", None),
+    }
+
+
+def accumulator_options(args):
+    """Translate parsed arguments into BatchAccumulator keyword arguments."""
+    return {
+        "max_bytes": args.max_batch_bytes,
+        "max_linger": args.linger,
+    }
+
+
+def make_sink(args, envelope, entries_key, label, table_schema=None, table_columns=None, headers=None,
+              signal="logs", resource_keys=()):
+    """Return the sink selected by --output and --protocol.
+
+    signal ("logs" or "metrics") and resource_keys only matter for OTLP.
+    """
+    if args.output:
+        return _file_sink(args, label, table_schema, table_columns)
+    if args.protocol == "coralogix":
+        accumulator = BatchAccumulator(envelope, entries_key, **accumulator_options(args))
+        return sinks.EngineSink(args.url or args.default_url, accumulator, headers=headers, label=label,
+                                **engine_options(args))
+    if args.protocol == "remote-write":
+        return _remote_write_sink(args, label, headers, signal)
+    if not otlp.available():
+        raise SystemExit("OTLP output needs the opentelemetry-proto package.")
+    url = args.url or otlp.default_endpoint(args.protocol, signal)
+    accumulator = otlp.make_accumulator(signal, resource_keys=resource_keys, **accumulator_options(args))
+    options = engine_options(args)
+    if args.protocol == "otlp-http":
+        headers = {**(headers or {}), "Content-Type": "application/x-protobuf"}
+        return sinks.EngineSink(url, accumulator, headers=headers, label=label, **options)
+    if otlp.grpc is None:
+        raise SystemExit("OTLP/gRPC output needs the grpcio package.")
+    # gRPC compresses messages itself instead of sending a Content-Encoding, and only gzip is built in.
+    compressor = options.pop("compressor")
+    if compressor is not None and compressor.encoding != "gzip":
+        raise SystemExit(f"OTLP/gRPC output supports --compression none or gzip, not {compressor.encoding}.")
+    return sinks.EngineSink(url, accumulator, engine_class=otlp.GrpcShippingEngine, signal=signal, headers=headers,
+                            grpc_compression=compressor.encoding if compressor else None, label=label, **options)
+
+
+def _remote_write_sink(args, label, headers, signal):
+    if signal != "metrics":
+        raise SystemExit("Prometheus remote-write only carries metrics.")
+    options = engine_options(args)
+    # The protocol requires snappy whatever --compression says.
+    try:
+        options["compressor"] = Compressor("snappy")
+    except RuntimeError as e:
+        raise SystemExit(f"Prometheus remote-write output: {e}.")
+    accumulator = remotewrite.RemoteWriteAccumulator(**accumulator_options(args))
+    headers = {**(headers or {}), **remotewrite.HEADERS}
+    return sinks.EngineSink(args.url or remotewrite.DEFAULT_ENDPOINT, accumulator, headers=headers, label=label,
+                            **options)
+
+
+def _file_sink(args, label, table_schema, table_columns):
+    path = args.output
+    if getattr(args, "workers", 1) > 1:
+        path = sinks.worker_path(path, args.worker_id)
+    file_format = sinks.output_format(path)
+    if file_format == "ndjson":
+        return sinks.NdjsonSink(path, label=label)
+    if table_schema is None:
+        raise ValueError(f"{label} have no table schema for {file_format} output")
+    return sinks.ArrowSink(path, table_schema, table_columns, file_format, args.row_group_rows, label=label)
@@ -0,0 +1,81 @@
+"""Optional request body compression.
+
+gzip comes from the standard library; zstd needs the zstandard package and
+falls back to gzip when it is not installed. snappy (the raw block format
+Prometheus remote-write uses) needs cramjam or python-snappy and has no
+fallback.
+"""
+import gzip
+import threading
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional
+    zstandard = None
+
+try:
+    import cramjam
+except ImportError:  # snappy is optional too, from either package
+    cramjam = None
+try:
+    import snappy
+except ImportError:
+    snappy = None
+
+# === CONSTANTS ===
+ENCODINGS = ("none", "gzip", "zstd", "snappy")
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+
+
+class Compressor:
+    """Compresses request bodies and names the matching Content-Encoding."""
+
+    def __init__(self, encoding="gzip", level=None):
+        if encoding not in ENCODINGS or encoding == "none":
+            raise ValueError(f"unsupported compression: {encoding}")
+        if encoding == "zstd" and zstandard is None:
+            print("zstandard is not installed; falling back to gzip compression.")
+            encoding = "gzip"
+            level = None
+        if encoding == "snappy" and cramjam is None and snappy is None:
+            raise RuntimeError("snappy compression needs the cramjam or python-snappy package")
+        self.encoding = encoding
+        # snappy has no levels.
+        self.level = DEFAULT_LEVELS.get(encoding) if level is None else level
+        # ZstdCompressor objects must not be shared between threads.
+        self._local = threading.local()
+
+    @property
+    def headers(self):
+        return {"Content-Encoding": self.encoding}
+
+    def compress(self, body):
+        """Compress body; safe to call from several threads at once."""
+        if self.encoding == "zstd":
+            compressor = getattr(self._local, "zstd", None)
+            if compressor is None:
+                compressor = self._local.zstd = zstandard.ZstdCompressor(level=self.level)
+            return compressor.compress(body)
+        if self.encoding == "snappy":
+            return snappy_compress(body)
+        return gzip.compress(body, compresslevel=self.level, mtime=0)
+
+
+def snappy_compress(body):
+    """Snappy block format, without the framing of the streaming format."""
+    if cramjam is not None:
+        return bytes(cramjam.snappy.compress_raw(body))
+    return snappy.compress(body)
+
+
+def snappy_decompress(body):
+    if cramjam is not None:
+        return bytes(cramjam.snappy.decompress_raw(body))
+    return snappy.uncompress(body)
+
+
+def make_compressor(encoding, level=None):
+    """Return a Compressor, or None when encoding is "none" or empty."""
+    if not encoding or encoding == "none":
+        return None
+    return Compressor(encoding, level)
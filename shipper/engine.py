@@ -0,0 +1,268 @@
+"""Async shipping engine shared by the Coralogix sender scripts.
+
+The senders hand batches to a ShippingEngine, which posts them over a pooled
+keep-alive HTTP session with a bounded number of requests in flight.
+"""
+import asyncio
+import time
+
+import aiohttp
+
+from shipper.retry import PERMANENT, SUCCESS, CircuitBreaker, RetryPolicy, classify, parse_retry_after
+from shipper.stats import ShipperStats
+
+# === CONSTANTS ===
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_TIMEOUT_SECONDS = 30
+KEEPALIVE_SECONDS = 60
+DEFAULT_REPLAY_RATE = 5.0  # spooled batches replayed per second
+REPLAY_IDLE_SECONDS = 1.0
+REPLAY_RETRY_SECONDS = 5.0
+STATS_REPORT_SECONDS = 1.0
+
+
+class ShippingEngine:
+    """Posts batches to one endpoint with at most max_in_flight requests outstanding.
+
+    Use as an async context manager, then either call submit() per batch or
+    hand run() an iterable of (body, event_count) pairs, where body is the
+    already serialized JSON request.
+
+    A rate_controller paces batches by bytes and events per second and holds
+    them once its daily cap is spent. With a compressor, bodies are compressed
+    off the event loop and the byte limits are charged on the uncompressed
+    ("raw") or compressed ("wire") size.
+
+    With a spool, each batch is written to disk before it is sent and
+    acknowledged after a 2xx; failed batches are replayed in the background
+    at replay_rate batches per second.
+
+    Retryable failures are retried per retry_policy behind the endpoint's
+    circuit breaker; only delivered batches count against the daily cap.
+
+    A stats_reporter callable, if given, receives a snapshot() every
+    STATS_REPORT_SECONDS and once more on close.
+    """
+
+    def __init__(self, url, headers=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 rate_controller=None, timeout=DEFAULT_TIMEOUT_SECONDS,
+                 label="logs", verbose=True, compressor=None, budget_on="raw",
+                 spool=None, replay_rate=DEFAULT_REPLAY_RATE, retry_policy=None,
+                 stats_reporter=None):
+        if budget_on not in ("raw", "wire"):
+            raise ValueError(f"budget_on must be 'raw' or 'wire', not {budget_on!r}")
+        self.url = url
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.compressor = compressor
+        self.budget_on = budget_on
+        if compressor is not None:
+            self.headers.update(compressor.headers)
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.label = label
+        self.verbose = verbose
+        self.stats = ShipperStats()
+        self.rate_controller = rate_controller
+        self.spool = spool
+        self.replay_rate = replay_rate
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = CircuitBreaker.for_endpoint(url)
+        self._session = None
+        self._slots = None
+        self._tasks = set()
+        self._queued = 0
+        self._replayer = None
+        self.stats_reporter = stats_reporter
+        self._reporter_task = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        await self._open_transport()
+        if self.spool is not None:
+            self._replayer = asyncio.create_task(self._replay())
+        if self.stats_reporter is not None:
+            self._reporter_task = asyncio.create_task(self._report())
+
+    async def close(self):
+        await self.drain()
+        if self._replayer is not None:
+            self._replayer.cancel()
+            await asyncio.gather(self._replayer, return_exceptions=True)
+            self._replayer = None
+            # A replay send outlives the cancel (see _replay); let it settle before closing the spool.
+            await self.drain()
+        await self._close_transport()
+        if self.spool is not None:
+            self.spool.close()
+        if self._reporter_task is not None:
+            self._reporter_task.cancel()
+            await asyncio.gather(self._reporter_task, return_exceptions=True)
+            self._reporter_task = None
+            self.stats_reporter(self.snapshot())
+
+    def snapshot(self):
+        """Stats snapshot, with the queue, in-flight and spool gauges as of now."""
+        self.stats.queued = self._queued
+        self.stats.in_flight = len(self._tasks)
+        if self.spool is not None:
+            self.stats.spool_backlog = self.spool.backlog_size
+            self.stats.spool_pending = self.spool.pending_count
+        return self.stats.snapshot()
+
+    async def drain(self):
+        """Wait for every in-flight request to finish."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def submit(self, body, count):
+        """Queue one serialized batch; blocks while max_in_flight requests are outstanding."""
+        raw_size = len(body)
+        record_id = self.spool.append(body, count) if self.spool is not None else None
+        self._queued += 1
+        try:
+            body = await self._encode(body)
+            await self._charge(raw_size, body, count)
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+        self._start_send(body, count, raw_size, record_id)
+
+    def _start_send(self, body, count, raw_size, record_id):
+        """Send in a task drain() waits for; the caller holds a request slot."""
+        task = asyncio.create_task(self._send(body, count, raw_size, record_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _budget_bytes(self, raw_size, body):
+        return raw_size if self.budget_on == "raw" else len(body)
+
+    async def _charge(self, raw_size, body, count):
+        if self.rate_controller is not None:
+            await self.rate_controller.acquire(self._budget_bytes(raw_size, body), count)
+
+    async def _encode(self, body):
+        if self.compressor is None:
+            return body
+        return await asyncio.to_thread(self.compressor.compress, body)
+
+    async def _replay(self):
+        """Drain the spool backlog at replay_rate batches per second."""
+        while True:
+            record_id = self.spool.next_backlog()
+            if record_id is None:
+                await asyncio.sleep(REPLAY_IDLE_SECONDS)
+                continue
+            raw, count = self.spool.read(record_id)
+            body = await self._encode(raw)
+            await self._charge(len(raw), body, count)
+            await self._slots.acquire()
+            # Shielded, so cancelling the replayer on close never interrupts a send: one
+            # cancelled after the ingress accepted the body would be released and sent again.
+            delivered = await asyncio.shield(self._start_send(body, count, len(raw), record_id))
+            await asyncio.sleep(1 / self.replay_rate if delivered else REPLAY_RETRY_SECONDS)
+
+    async def run(self, batches):
+        """Submit every (body, count) pair from a sync or async iterable."""
+        if hasattr(batches, "__aiter__"):
+            async for body, count in batches:
+                await self.submit(body, count)
+        else:
+            for body, count in batches:
+                await self.submit(body, count)
+        await self.drain()
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(STATS_REPORT_SECONDS)
+            self.stats_reporter(self.snapshot())
+
+    async def _open_transport(self):
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, keepalive_timeout=KEEPALIVE_SECONDS)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    async def _close_transport(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _post(self, body):
+        """Post body once; returns (status, retry_after_seconds, response_body).
+
+        Subclasses with another transport override this together with
+        _open_transport() and _close_transport().
+        """
+        async with self._session.post(self.url, data=body) as response:
+            response_body = await response.read()
+            return response.status, parse_retry_after(response.headers.get("Retry-After")), response_body
+
+    async def _send(self, body, count, raw_size, record_id=None):
+        """Deliver one body with retries; returns True on a 2xx. Releases the caller's slot."""
+        outcome = None
+        try:
+            for attempt in range(self.retry_policy.max_attempts):
+                await self.breaker.wait()
+                retry_after = None
+                started = time.monotonic()
+                try:
+                    status, retry_after, response_body = await self._post(body)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    status, response_body = None, str(e).encode()
+                self.stats.latency.observe(time.monotonic() - started)
+                outcome = classify(status)
+                if outcome == SUCCESS:
+                    self.breaker.record_success()
+                    self.stats.batches_sent += 1
+                    self.stats.events_sent += count
+                    self.stats.bytes_sent += raw_size
+                    self.stats.wire_bytes_sent += len(body)
+                    if self.verbose:
+                        print(f"Sent {count} {self.label} ({raw_size} bytes, {len(body)} on the wire). Response: {status}. Total sent: {self.stats.bytes_sent / 1024:.2f} KB")
+                    break
+                self.stats.errors += 1
+                print(f"Error sending {self.label}. Status Code: {status}")
+                print(f"Response Body: {response_body.decode('utf-8', 'replace')}")
+                if outcome == PERMANENT:
+                    # The endpoint answered, so it is healthy; this batch never will be.
+                    self.breaker.record_success()
+                    break
+                self.breaker.record_failure(retry_after)
+                if attempt + 1 < self.retry_policy.max_attempts:
+                    self.stats.retries += 1
+                    await asyncio.sleep(self.retry_policy.delay(attempt, retry_after))
+        except Exception as e:
+            self.stats.errors += 1
+            print(f"An unexpected error occurred: {e}")
+        finally:
+            self.breaker.release_probe()
+            self._slots.release()
+            self._settle(outcome, count, raw_size, body, record_id)
+        return outcome == SUCCESS
+
+    def _settle(self, outcome, count, raw_size, body, record_id):
+        if outcome != SUCCESS and self.rate_controller is not None:
+            self.rate_controller.refund(self._budget_bytes(raw_size, body))
+        if outcome == PERMANENT:
+            self.stats.dropped += 1
+            print(f"Dropping {count} {self.label} rejected permanently by ingress.")
+        if record_id is None:
+            if outcome not in (SUCCESS, PERMANENT):
+                # Out of attempts with nowhere to keep the batch.
+                self.stats.dropped += 1
+                print(f"Giving up on {count} {self.label}: delivery failed and no spool keeps them for replay.")
+            return
+        if outcome in (SUCCESS, PERMANENT):
+            self.spool.ack(record_id)
+        else:
+            self.spool.release(record_id)
@@ -0,0 +1,102 @@
+"""Prometheus /metrics endpoint for the shipper's own stats (--metrics-port).
+
+MetricsExporter serves the latest stats snapshot in the Prometheus text
+format from a background thread, so scraping it never touches the event
+loop. The engine's stats_reporter hook feeds it once a second; with
+--workers the parent feeds it the merged snapshot of all workers.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from shipper.stats import LATENCY_BUCKETS
+
+# === CONSTANTS ===
+DEFAULT_HOST = "127.0.0.1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Exposed name -> (snapshot field, type, help)
+METRICS = {
+    "shipper_batches_sent_total": ("batches_sent", "counter", "Batches delivered with a 2xx."),
+    "shipper_events_sent_total": ("events_sent", "counter", "Entries in delivered batches."),
+    "shipper_bytes_sent_total": ("bytes_sent", "counter", "Uncompressed body bytes delivered."),
+    "shipper_wire_bytes_sent_total": ("wire_bytes_sent", "counter", "Body bytes delivered as sent, after compression."),
+    "shipper_errors_total": ("errors", "counter", "Failed send attempts."),
+    "shipper_retries_total": ("retries", "counter", "Send attempts that were retried."),
+    "shipper_dropped_batches_total": ("dropped", "counter", "Batches given up: rejected permanently, or out of attempts without a spool."),
+    "shipper_queued_batches": ("queued", "gauge", "Batches waiting for the rate limiter or a request slot."),
+    "shipper_in_flight_requests": ("in_flight", "gauge", "Batches being sent or waiting to retry."),
+    "shipper_spool_backlog_batches": ("spool_backlog", "gauge", "Spooled batches waiting for replay."),
+    "shipper_spool_pending_batches": ("spool_pending", "gauge", "Spooled batches not yet acknowledged."),
+}
+LATENCY_METRIC = "shipper_send_latency_seconds"
+
+
+def render(snapshot):
+    """A stats snapshot in the Prometheus text exposition format."""
+    lines = []
+    for name, (field, kind, description) in METRICS.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {snapshot[field]}")
+    lines.append(f"# HELP {LATENCY_METRIC} Time per send attempt.")
+    lines.append(f"# TYPE {LATENCY_METRIC} histogram")
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), snapshot["latency_buckets"]):
+        cumulative += count
+        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+        lines.append(f'{LATENCY_METRIC}_bucket{{le="{le}"}} {cumulative}')
+    lines.append(f"{LATENCY_METRIC}_sum {snapshot['latency_sum']}")
+    lines.append(f"{LATENCY_METRIC}_count {cumulative}")
+    if "workers" in snapshot:
+        lines.append("# HELP shipper_workers Worker processes reporting.")
+        lines.append("# TYPE shipper_workers gauge")
+        lines.append(f"shipper_workers {snapshot['workers']}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Serves render() of the latest snapshot at /metrics on host:port."""
+
+    def __init__(self, port, host=DEFAULT_HOST):
+        self.host = host
+        self.port = port
+        self._snapshot = None
+        self._server = None
+
+    def update(self, snapshot):
+        """Replace the served snapshot; usable as an engine stats_reporter."""
+        self._snapshot = snapshot
+
+    def _handler_class(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                snapshot = exporter._snapshot
+                body = render(snapshot).encode() if snapshot is not None else b""
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes are not worth a line on stdout each.
+                pass
+
+        return Handler
+
+    def start(self):
+        """Start serving on a daemon thread; returns the bound port."""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler_class())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-exporter", daemon=True).start()
+        return self._server.server_address[1]
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
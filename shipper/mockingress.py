@@ -0,0 +1,292 @@
+"""Local stand-in for the Coralogix ingress endpoints.
+
+Accepts the /api/v1/logs and /metrics payloads the sender scripts post, checks
+their shape and counts what arrives. /api/v1/write takes Prometheus
+remote-write requests when cramjam or python-snappy is installed, and with
+opentelemetry-proto installed it also serves the OTLP/HTTP /v1/logs and
+/v1/metrics routes. Latency, 5xx errors and 429 throttling
+can be injected, so shipper throughput and backpressure can be measured
+without a Coralogix account:
+
+    python -m shipper.mockingress --port 8080 --latency-ms 20 --throttle-rate 0.05
+    python senddatatocoralogix.py --url http://127.0.0.1:8080/api/v1/logs --no-pace
+
+GET /stats returns the counters as JSON.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import time
+
+from aiohttp import web
+
+from shipper import compression
+from shipper.remotewrite import decode_write_request
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional
+    zstandard = None
+
+try:
+    from google.protobuf.message import DecodeError
+    from opentelemetry.proto.collector.logs.v1.logs_service_pb2 import ExportLogsServiceRequest
+    from opentelemetry.proto.collector.metrics.v1.metrics_service_pb2 import ExportMetricsServiceRequest
+except ImportError:  # the OTLP/HTTP routes are optional
+    ExportLogsServiceRequest = None
+
+# === CONSTANTS ===
+DEFAULT_PORT = 8080
+INGRESS_MAX_REQUEST_BYTES = 2 * 1024 * 1024
+REPORT_SECONDS = 5.0
+
+
+class PayloadError(ValueError):
+    """Raised when a request body does not match the expected payload shape."""
+
+
+def _require(condition, message):
+    if not condition:
+        raise PayloadError(message)
+
+
+def validate_logs(payload):
+    """Check a /api/v1/logs body; returns the number of log entries."""
+    _require(isinstance(payload, dict), "payload must be a JSON object")
+    for key in ("privateKey", "applicationName", "subsystemName"):
+        _require(isinstance(payload.get(key), str), f"{key} must be a string")
+    entries = payload.get("logEntries")
+    _require(isinstance(entries, list), "logEntries must be a list")
+    for entry in entries:
+        _require(isinstance(entry, dict), "each log entry must be an object")
+        _require(isinstance(entry.get("text"), str), "log entry text must be a string")
+        severity = entry.get("severity", 3)
+        _require(isinstance(severity, int) and 1 <= severity <= 6, "log entry severity must be 1-6")
+        timestamp = entry.get("timestamp", 0)
+        _require(isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool),
+                 "log entry timestamp must be a number of epoch milliseconds")
+    return len(entries)
+
+
+def validate_metrics(payload):
+    """Check a /metrics body; returns the number of samples."""
+    _require(isinstance(payload, dict), "payload must be a JSON object")
+    metrics = payload.get("metrics")
+    _require(isinstance(metrics, list), "metrics must be a list")
+    for metric in metrics:
+        _require(isinstance(metric, dict), "each metric must be an object")
+        _require(isinstance(metric.get("name"), str), "metric name must be a string")
+        _require(isinstance(metric.get("value"), (int, float)), "metric value must be a number")
+        _require(isinstance(metric.get("timestamp"), int), "metric timestamp must be an integer")
+        _require(isinstance(metric.get("labels", {}), dict), "metric labels must be an object")
+    return len(metrics)
+
+
+def count_otlp_logs(request):
+    """Number of log records in an ExportLogsServiceRequest."""
+    return sum(len(scope.log_records) for resource in request.resource_logs for scope in resource.scope_logs)
+
+
+def count_otlp_metrics(request):
+    """Number of data points in an ExportMetricsServiceRequest."""
+    points = 0
+    for resource in request.resource_metrics:
+        for scope in resource.scope_metrics:
+            for metric in scope.metrics:
+                kind = metric.WhichOneof("data")
+                if kind is not None:
+                    points += len(getattr(metric, kind).data_points)
+    return points
+
+
+def validate_remote_write(series):
+    """Check a decoded WriteRequest; returns the number of samples."""
+    for labels, samples in series:
+        _require(labels.get("__name__"), "every series needs a __name__ label")
+        _require(list(labels) == sorted(labels), "series labels must be sorted by name")
+    return sum(len(samples) for _, samples in series)
+
+
+def _protobuf_parser(message_class):
+    def parse(body):
+        try:
+            return message_class.FromString(body)
+        except DecodeError as e:
+            raise PayloadError(f"invalid protobuf: {e}")
+    return parse
+
+
+def decode_body(body, encoding):
+    """Undo Content-Encoding; raises PayloadError for encodings we cannot read."""
+    if not encoding or encoding == "identity":
+        return body
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    if encoding == "snappy" and (compression.cramjam is not None or compression.snappy is not None):
+        try:
+            return compression.snappy_decompress(body)
+        except Exception as e:  # the two snappy packages raise different errors
+            raise PayloadError(f"invalid snappy body: {e}")
+    raise PayloadError(f"unsupported Content-Encoding: {encoding}")
+
+
+class IngressStats:
+    """Counters for what the mock has received."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.wire_bytes = 0
+        self.bytes = 0
+        self.events = 0
+        self.statuses = {}
+
+    def record(self, status, wire_bytes=0, decoded_bytes=0, events=0):
+        self.requests += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.wire_bytes += wire_bytes
+        self.bytes += decoded_bytes
+        self.events += events
+
+    def snapshot(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "requests": self.requests,
+            "wire_bytes": self.wire_bytes,
+            "bytes": self.bytes,
+            "events": self.events,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "elapsed_seconds": elapsed,
+            "events_per_second": self.events / elapsed,
+            "bytes_per_second": self.bytes / elapsed,
+            "wire_bytes_per_second": self.wire_bytes / elapsed,
+        }
+
+
+class MockIngress:
+    """aiohttp application emulating the logs and metrics ingress endpoints."""
+
+    def __init__(self, latency_ms=0.0, latency_jitter_ms=0.0, error_rate=0.0, throttle_rate=0.0,
+                 retry_after=1.0, max_request_bytes=INGRESS_MAX_REQUEST_BYTES, validate=True):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.max_request_bytes = max_request_bytes
+        self.validate = validate
+        self.stats = IngressStats()
+        self._runner = None
+
+    def make_app(self):
+        app = web.Application(client_max_size=self.max_request_bytes)
+        app.router.add_post("/api/v1/logs", self._handler(validate_logs))
+        app.router.add_post("/metrics", self._handler(validate_metrics))
+        app.router.add_post("/api/v1/write", self._handler(validate_remote_write, decode_write_request))
+        if ExportLogsServiceRequest is not None:
+            app.router.add_post("/v1/logs", self._handler(count_otlp_logs, _protobuf_parser(ExportLogsServiceRequest)))
+            app.router.add_post("/v1/metrics", self._handler(count_otlp_metrics, _protobuf_parser(ExportMetricsServiceRequest)))
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """Serve in the current event loop; returns the base URL."""
+        # Bodies are decompressed by decode_body() so both gzip and zstd are counted on the wire.
+        self._runner = web.AppRunner(self.make_app(), auto_decompress=False)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        return f"http://{host}:{bound_port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle_stats(self, request):
+        return web.json_response(self.stats.snapshot())
+
+    def _handler(self, validator, parse=json.loads):
+        async def handle(request):
+            body = await request.read()
+            if self.latency_ms or self.latency_jitter_ms:
+                await asyncio.sleep((self.latency_ms + random.uniform(0, self.latency_jitter_ms)) / 1000)
+            roll = random.random()
+            if roll < self.throttle_rate:
+                self.stats.record(429, len(body))
+                return web.json_response({"error": "rate limited"}, status=429,
+                                         headers={"Retry-After": f"{self.retry_after:g}"})
+            if roll < self.throttle_rate + self.error_rate:
+                self.stats.record(503, len(body))
+                return web.json_response({"error": "injected failure"}, status=503)
+            try:
+                decoded = decode_body(body, request.headers.get("Content-Encoding"))
+                events = validator(parse(decoded)) if self.validate else 0
+            except (PayloadError, ValueError, OSError) as e:
+                self.stats.record(400, len(body))
+                return web.json_response({"error": str(e)}, status=400)
+            self.stats.record(200, len(body), len(decoded), events)
+            return web.json_response({"accepted": events})
+        return handle
+
+
+async def _serve(args):
+    ingress = MockIngress(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        max_request_bytes=args.max_request_bytes,
+        validate=not args.no_validate,
+    )
+    url = await ingress.start(args.host, args.port)
+    print(f"Mock ingress listening on {url} (/api/v1/logs, /metrics, /api/v1/write, /stats)")
+    previous = ingress.stats.snapshot()
+    try:
+        while True:
+            await asyncio.sleep(REPORT_SECONDS)
+            current = ingress.stats.snapshot()
+            window = current["elapsed_seconds"] - previous["elapsed_seconds"]
+            print(f"events/s={(current['events'] - previous['events']) / window:.0f} "
+                  f"bytes/s={(current['bytes'] - previous['bytes']) / window:.0f} "
+                  f"wire bytes/s={(current['wire_bytes'] - previous['wire_bytes']) / window:.0f} "
+                  f"statuses={current['statuses']}")
+            previous = current
+    finally:
+        await ingress.stop()
+
+
+def main():
+    """Runs a local mock of the Coralogix logs and metrics ingress."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="fixed delay before answering each request")
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0,
+                        help="extra uniform random delay on top of --latency-ms")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 429 and Retry-After")
+    parser.add_argument("--retry-after", type=float, default=1.0,
+                        help="Retry-After seconds sent with injected 429s (default: %(default)s)")
+    parser.add_argument("--max-request-bytes", type=int, default=INGRESS_MAX_REQUEST_BYTES,
+                        help="reject larger bodies with 413 (default: %(default)s)")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="skip JSON parsing and schema checks; events are then not counted")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""OTLP output: entries as ExportLogsServiceRequest / ExportMetricsServiceRequest.
+
+OtlpLogsAccumulator and OtlpMetricsAccumulator stand in for BatchAccumulator
+in accumulate(). They group entries per resource and yield serialized
+protobuf requests. OTLP/HTTP posts those bodies with the regular
+ShippingEngine; GrpcShippingEngine sends them as unary Export calls instead.
+
+Log entries are the Coralogix-style dicts the log senders build: text,
+severity 1-6, a resource dict and an attributes dict (trace_id and span_id
+become the record's native ids). Metric entries are {name, value, timestamp
+in ms, labels}; the labels named in resource_keys describe the resource, the
+rest become data point attributes.
+
+Needs the opentelemetry-proto package, and grpcio for gRPC.
+"""
+import time
+
+from shipper.engine import ShippingEngine
+
+try:
+    from opentelemetry.proto.collector.logs.v1 import logs_service_pb2
+    from opentelemetry.proto.collector.metrics.v1 import metrics_service_pb2
+    from opentelemetry.proto.common.v1 import common_pb2
+    from opentelemetry.proto.logs.v1 import logs_pb2
+    from opentelemetry.proto.metrics.v1 import metrics_pb2
+    from opentelemetry.proto.resource.v1 import resource_pb2
+except ImportError:  # OTLP output is optional
+    logs_service_pb2 = None
+
+try:
+    import grpc
+    import grpc.aio
+except ImportError:  # so is gRPC
+    grpc = None
+
+# === CONSTANTS ===
+DEFAULT_HTTP_ENDPOINT = "http://localhost:4318"
+DEFAULT_GRPC_ENDPOINT = "localhost:4317"
+HTTP_PATHS = {"logs": "/v1/logs", "metrics": "/v1/metrics"}
+GRPC_METHODS = {
+    "logs": "/opentelemetry.proto.collector.logs.v1.LogsService/Export",
+    "metrics": "/opentelemetry.proto.collector.metrics.v1.MetricsService/Export",
+}
+SCOPE_NAME = "shipper"
+# Bytes a length-delimited field adds around a nested message, at most.
+FIELD_OVERHEAD_BYTES = 6
+# Coralogix severity (1=Debug ... 6=Critical) -> OTLP SeverityNumber and text.
+SEVERITIES = {
+    1: (5, "DEBUG"),
+    2: (1, "TRACE"),
+    3: (9, "INFO"),
+    4: (13, "WARN"),
+    5: (17, "ERROR"),
+    6: (21, "FATAL"),
+}
+# gRPC status name -> HTTP status with the same retry meaning, for classify().
+GRPC_STATUSES = {
+    "OK": 200,
+    "CANCELLED": 503,
+    "DEADLINE_EXCEEDED": 504,
+    "ABORTED": 503,
+    "OUT_OF_RANGE": 503,
+    "UNAVAILABLE": 503,
+    "DATA_LOSS": 503,
+    "RESOURCE_EXHAUSTED": 429,
+    "UNAUTHENTICATED": 401,
+    "PERMISSION_DENIED": 403,
+    "UNIMPLEMENTED": 404,
+}
+
+
+def available():
+    return logs_service_pb2 is not None
+
+
+def any_value(value):
+    """Wrap a Python scalar in an OTLP AnyValue."""
+    if isinstance(value, bool):
+        return common_pb2.AnyValue(bool_value=value)
+    if isinstance(value, int):
+        return common_pb2.AnyValue(int_value=value)
+    if isinstance(value, float):
+        return common_pb2.AnyValue(double_value=value)
+    return common_pb2.AnyValue(string_value=str(value))
+
+
+def key_values(attributes):
+    return [common_pb2.KeyValue(key=key, value=any_value(value)) for key, value in attributes.items()]
+
+
+def default_endpoint(protocol, signal):
+    if protocol == "otlp-grpc":
+        return DEFAULT_GRPC_ENDPOINT
+    return DEFAULT_HTTP_ENDPOINT + HTTP_PATHS[signal]
+
+
+class _OtlpAccumulator:
+    """Size/linger batching of entries grouped per resource.
+
+    Same interface as BatchAccumulator; sizes are the protobuf encoded sizes
+    of the records plus an allowance per resource group.
+    """
+
+    def __init__(self, max_bytes, max_linger):
+        if logs_service_pb2 is None:
+            raise RuntimeError("OTLP output needs the opentelemetry-proto package")
+        self.max_bytes = max_bytes
+        self.max_linger = max_linger
+        self._resources = {}
+        self.reset()
+
+    def reset(self):
+        # resource key -> records, in insertion order
+        self._groups = {}
+        self.count = 0
+        self.size = 0
+        self.opened_at = None
+
+    def __len__(self):
+        return self.count
+
+    def _resource(self, key, attributes):
+        resource = self._resources.get(key)
+        if resource is None:
+            resource = self._resources[key] = resource_pb2.Resource(attributes=key_values(attributes))
+        return resource
+
+    def _add(self, key, attributes, record, size):
+        batches = []
+        cost = size + FIELD_OVERHEAD_BYTES
+        if key not in self._groups:
+            cost += self._resource(key, attributes).ByteSize() + 4 * FIELD_OVERHEAD_BYTES + len(SCOPE_NAME)
+        if self.count and self.size + cost > self.max_bytes:
+            batches.append(self.flush())
+            return batches + self._add(key, attributes, record, size)
+        if not self.count:
+            self.opened_at = time.monotonic()
+        self._groups.setdefault(key, []).append(record)
+        self.count += 1
+        self.size += cost
+        return batches
+
+    def time_left(self):
+        if not self.count:
+            return None
+        return max(0.0, self.opened_at + self.max_linger - time.monotonic())
+
+    def flush(self):
+        """Return (body, entry_count) for the current batch and start a new one."""
+        body = self._request().SerializeToString()
+        count = self.count
+        self.reset()
+        return body, count
+
+
+class OtlpLogsAccumulator(_OtlpAccumulator):
+    """Builds ExportLogsServiceRequest bodies from log entry dicts."""
+
+    signal = "logs"
+
+    def add(self, entry):
+        """Add one entry; returns the batches (zero or one) that had to be flushed first."""
+        attributes = dict(entry.get("attributes") or {})
+        record = logs_pb2.LogRecord(observed_time_unix_nano=time.time_ns())
+        if "timestamp" in entry:
+            record.time_unix_nano = int(entry["timestamp"] * 1_000_000)
+        number, text = SEVERITIES.get(entry.get("severity", 3), SEVERITIES[3])
+        record.severity_number = number
+        record.severity_text = text
+        record.body.string_value = entry["text"]
+        trace_id, span_id = attributes.pop("trace_id", None), attributes.pop("span_id", None)
+        if trace_id:
+            record.trace_id = bytes.fromhex(trace_id)
+        if span_id:
+            record.span_id = bytes.fromhex(span_id)
+        record.attributes.extend(key_values(attributes))
+        resource = entry.get("resource") or {}
+        return self._add(tuple(resource.items()), resource, record, record.ByteSize())
+
+    def _request(self):
+        scope = common_pb2.InstrumentationScope(name=SCOPE_NAME)
+        return logs_service_pb2.ExportLogsServiceRequest(resource_logs=[
+            logs_pb2.ResourceLogs(
+                resource=self._resources[key],
+                scope_logs=[logs_pb2.ScopeLogs(scope=scope, log_records=records)],
+            )
+            for key, records in self._groups.items()
+        ])
+
+
+class OtlpMetricsAccumulator(_OtlpAccumulator):
+    """Builds ExportMetricsServiceRequest bodies of gauges from metric entry dicts."""
+
+    signal = "metrics"
+
+    def __init__(self, max_bytes, max_linger, resource_keys=()):
+        super().__init__(max_bytes, max_linger)
+        self.resource_keys = tuple(resource_keys)
+
+    def add(self, entry):
+        """Add one entry; returns the batches (zero or one) that had to be flushed first."""
+        labels = entry.get("labels") or {}
+        resource = {key: labels[key] for key in self.resource_keys if key in labels}
+        point = metrics_pb2.NumberDataPoint(
+            time_unix_nano=int(entry["timestamp"]) * 1_000_000,
+            as_double=float(entry["value"]),
+            attributes=key_values({key: value for key, value in labels.items() if key not in resource}),
+        )
+        # Metric names are grouped inside a resource when the request is built.
+        record = (entry["name"], point)
+        size = point.ByteSize() + len(entry["name"]) + 2 * FIELD_OVERHEAD_BYTES
+        return self._add(tuple(resource.items()), resource, record, size)
+
+    def _request(self):
+        scope = common_pb2.InstrumentationScope(name=SCOPE_NAME)
+        resource_metrics = []
+        for key, records in self._groups.items():
+            points = {}
+            for name, point in records:
+                points.setdefault(name, []).append(point)
+            metrics = [metrics_pb2.Metric(name=name, gauge=metrics_pb2.Gauge(data_points=data_points))
+                       for name, data_points in points.items()]
+            resource_metrics.append(metrics_pb2.ResourceMetrics(
+                resource=self._resources[key],
+                scope_metrics=[metrics_pb2.ScopeMetrics(scope=scope, metrics=metrics)],
+            ))
+        return metrics_service_pb2.ExportMetricsServiceRequest(resource_metrics=resource_metrics)
+
+
+def make_accumulator(signal, max_bytes, max_linger, resource_keys=()):
+    """Return the OTLP accumulator for "logs" or "metrics"."""
+    if signal == "logs":
+        return OtlpLogsAccumulator(max_bytes, max_linger)
+    if signal == "metrics":
+        return OtlpMetricsAccumulator(max_bytes, max_linger, resource_keys)
+    raise ValueError(f"unsupported OTLP signal: {signal}")
+
+
+class GrpcShippingEngine(ShippingEngine):
+    """ShippingEngine that sends each body as a unary OTLP Export call over gRPC.
+
+    url is host:port. Bodies go out as serialized requests without
+    re-encoding; compression, if any, is gRPC's own (gzip). Headers are sent
+    as call metadata. gRPC status codes are mapped onto the HTTP statuses
+    that classify() already understands.
+    """
+
+    def __init__(self, url, signal="logs", headers=None, grpc_compression=None, **options):
+        if grpc is None:
+            raise RuntimeError("OTLP/gRPC output needs the grpcio package")
+        super().__init__(url, **options)
+        self.method = GRPC_METHODS[signal]
+        self.metadata = tuple((key.lower(), value) for key, value in (headers or {}).items())
+        self.grpc_compression = grpc.Compression.Gzip if grpc_compression == "gzip" else None
+        self._channel = None
+        self._export = None
+
+    async def _open_transport(self):
+        self._channel = grpc.aio.insecure_channel(self.url, compression=self.grpc_compression)
+        # No serializers: bodies are already encoded requests, responses are left as bytes.
+        self._export = self._channel.unary_unary(self.method)
+
+    async def _close_transport(self):
+        if self._channel is not None:
+            await self._channel.close()
+            self._channel = None
+
+    async def _post(self, body):
+        try:
+            response = await self._export(body, timeout=self.timeout, metadata=self.metadata)
+        except grpc.aio.AioRpcError as e:
+            status = GRPC_STATUSES.get(e.code().name, 400)
+            return status, None, f"{e.code().name}: {e.details()}".encode()
+        return 200, None, response
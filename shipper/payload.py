@@ -0,0 +1,59 @@
+"""Pre-serialized request bodies.
+
+A PayloadBuilder encodes each entry exactly once into a byte buffer laid out
+as the final JSON document, so the size it reports is the size that is sent.
+"""
+import json
+
+# json.dumps puts ", " between list items.
+SEPARATOR = b", "
+
+
+def encode_entry(entry):
+    """Encode one entry the same way json.dumps would inside the payload."""
+    return json.dumps(entry).encode("utf-8")
+
+
+class PayloadBuilder:
+    """Builds {**envelope, entries_key: [entries...]} as UTF-8 JSON bytes."""
+
+    def __init__(self, envelope, entries_key):
+        skeleton = json.dumps({**envelope, entries_key: []}).encode("utf-8")
+        # The entries list is the last key, so the skeleton ends with b"[]}".
+        self._prefix = skeleton[:-2]
+        self._suffix = skeleton[-2:]
+        self.reset()
+
+    def reset(self):
+        self._buffer = bytearray(self._prefix)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def size(self):
+        """Size in bytes of the body finish() would return right now."""
+        return len(self._buffer) + len(self._suffix)
+
+    @property
+    def empty_size(self):
+        return len(self._prefix) + len(self._suffix)
+
+    def cost(self, encoded):
+        """Bytes that appending an already encoded entry would add."""
+        return len(encoded) + (len(SEPARATOR) if self.count else 0)
+
+    def append(self, encoded):
+        """Append an entry already encoded with encode_entry()."""
+        if self.count:
+            self._buffer += SEPARATOR
+        self._buffer += encoded
+        self.count += 1
+
+    def finish(self):
+        """Return the complete body and start a new, empty payload."""
+        self._buffer += self._suffix
+        body = bytes(self._buffer)
+        self.reset()
+        return body
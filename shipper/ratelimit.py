@@ -0,0 +1,117 @@
+"""Token-bucket rate control for the shipping engine.
+
+A RateController combines a bytes-per-second bucket, an events-per-second
+bucket and an optional daily byte cap that resets at UTC midnight. Each batch
+waits only as long as its own tokens need, so throughput follows the target
+rate smoothly instead of stopping for the rest of the day.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+# === CONSTANTS ===
+DEFAULT_BURST_SECONDS = 1.0
+
+
+class TokenBucket:
+    """Refills at rate tokens per second up to capacity.
+
+    A request larger than the capacity is let through once the bucket is full
+    and leaves it in debt, so oversized batches are slowed down, not blocked.
+    """
+
+    def __init__(self, rate, burst_seconds=DEFAULT_BURST_SECONDS):
+        self.rate = float(rate)
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount):
+        """Seconds until amount (capped at capacity) tokens are available."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount):
+        self._refill()
+        self.tokens -= amount
+
+
+class DailyCap:
+    """Byte allowance per UTC calendar day."""
+
+    def __init__(self, limit_bytes):
+        self.limit_bytes = limit_bytes
+        self.used_bytes = 0
+        self.day = datetime.now(timezone.utc).date()
+
+    def _roll_day(self):
+        today = datetime.now(timezone.utc).date()
+        if today != self.day:
+            self.day = today
+            self.used_bytes = 0
+            print("\n--- New UTC Day - Daily byte count reset ---")
+
+    def seconds_until_midnight(self):
+        now = datetime.now(timezone.utc)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+        return (midnight - now).total_seconds()
+
+    def delay_for(self, nbytes):
+        """Seconds until nbytes fit in the cap: 0 today, else until UTC midnight."""
+        self._roll_day()
+        # A batch bigger than the whole cap still goes out first thing in the day.
+        if self.used_bytes == 0 or self.used_bytes + nbytes <= self.limit_bytes:
+            return 0.0
+        return self.seconds_until_midnight()
+
+    def take(self, nbytes):
+        self.used_bytes += nbytes
+
+    def refund(self, nbytes):
+        self.used_bytes = max(0, self.used_bytes - nbytes)
+
+
+class RateController:
+    """Admits batches against byte and event rates plus an optional daily cap."""
+
+    def __init__(self, bytes_per_second=None, events_per_second=None, daily_bytes=None,
+                 burst_seconds=DEFAULT_BURST_SECONDS):
+        self.bytes_bucket = TokenBucket(bytes_per_second, burst_seconds) if bytes_per_second else None
+        self.events_bucket = TokenBucket(events_per_second, burst_seconds) if events_per_second else None
+        self.daily_cap = DailyCap(daily_bytes) if daily_bytes else None
+        self._lock = asyncio.Lock()
+
+    def _delay_for(self, nbytes, nevents):
+        delays = [0.0]
+        if self.bytes_bucket is not None:
+            delays.append(self.bytes_bucket.delay_for(nbytes))
+        if self.events_bucket is not None:
+            delays.append(self.events_bucket.delay_for(nevents))
+        if self.daily_cap is not None:
+            delays.append(self.daily_cap.delay_for(nbytes))
+        return max(delays)
+
+    async def acquire(self, nbytes, nevents):
+        """Wait until a batch of nbytes and nevents may be sent, then take its tokens."""
+        async with self._lock:
+            delay = self._delay_for(nbytes, nevents)
+            while delay > 0:
+                if self.daily_cap is not None and delay >= self.daily_cap.seconds_until_midnight() - 1:
+                    print(f"Daily byte limit ({self.daily_cap.limit_bytes / 1024 / 1024:.2f} MB) reached. Sent {self.daily_cap.used_bytes / 1024 / 1024:.2f} MB today.")
+                    print(f"Holding batches for {delay:.2f} seconds until UTC midnight.")
+                await asyncio.sleep(delay)
+                delay = self._delay_for(nbytes, nevents)
+            for bucket, amount in ((self.bytes_bucket, nbytes), (self.events_bucket, nevents), (self.daily_cap, nbytes)):
+                if bucket is not None:
+                    bucket.take(amount)
+
+    def refund(self, nbytes):
+        """Return a batch's bytes to the daily cap when it was not delivered."""
+        if self.daily_cap is not None:
+            self.daily_cap.refund(nbytes)
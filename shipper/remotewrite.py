@@ -0,0 +1,195 @@
+"""Prometheus remote-write v1 output: metric entries as a protobuf WriteRequest.
+
+RemoteWriteAccumulator stands in for BatchAccumulator in accumulate(). It
+groups samples per series, so each series' labels are written once per
+request however many samples it carries, and yields uncompressed
+WriteRequest bodies; the engine then compresses them with snappy as the
+protocol requires.
+
+The messages are small enough to encode by hand, which avoids a protobuf
+dependency:
+
+    WriteRequest { repeated TimeSeries timeseries = 1; }
+    TimeSeries   { repeated Label labels = 1; repeated Sample samples = 2; }
+    Label        { string name = 1; string value = 2; }
+    Sample       { double value = 1; int64 timestamp = 2; }
+
+Metric entries are {name, value, timestamp in ms, labels}, as the metrics
+sender builds them; the name becomes the __name__ label.
+"""
+import struct
+import time
+
+# === CONSTANTS ===
+DEFAULT_ENDPOINT = "http://localhost:9090/api/v1/write"
+HEADERS = {
+    "Content-Type": "application/x-protobuf",
+    "X-Prometheus-Remote-Write-Version": "0.1.0",
+}
+# Field tags: (field number << 3) | wire type (1 = 64-bit, 0 = varint, 2 = length-delimited).
+TIMESERIES_TAG = b"\x0a"
+LABEL_TAG = b"\x0a"
+LABEL_NAME_TAG = b"\x0a"
+LABEL_VALUE_TAG = b"\x12"
+SAMPLE_TAG = b"\x12"
+SAMPLE_VALUE_TAG = b"\x09"
+SAMPLE_TIMESTAMP_TAG = b"\x10"
+# Encoded label sets kept between requests; cleared when it grows past this.
+MAX_CACHED_SERIES = 100_000
+
+_double = struct.Struct("<d").pack
+
+
+def varint(value):
+    """Protobuf base-128 varint; negative int64 values take ten bytes."""
+    value &= 0xFFFFFFFFFFFFFFFF
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _delimited(tag, payload):
+    return tag + varint(len(payload)) + payload
+
+
+def encode_labels(name, labels):
+    """A series' Label fields, sorted by label name as Prometheus expects."""
+    pairs = sorted({**labels, "__name__": name}.items())
+    return b"".join(
+        _delimited(LABEL_TAG, _delimited(LABEL_NAME_TAG, key.encode()) + _delimited(LABEL_VALUE_TAG, str(value).encode()))
+        for key, value in pairs
+    )
+
+
+def encode_sample(value, timestamp):
+    """A Sample field: value as a double, timestamp in milliseconds."""
+    return _delimited(SAMPLE_TAG, SAMPLE_VALUE_TAG + _double(value) + SAMPLE_TIMESTAMP_TAG + varint(timestamp))
+
+
+class RemoteWriteAccumulator:
+    """Size/linger batching of metric entries into WriteRequest bodies.
+
+    Same interface as BatchAccumulator. Sizes count each series' labels once
+    and every sample it gets; max_bytes applies to the uncompressed body.
+    """
+
+    def __init__(self, max_bytes, max_linger):
+        self.max_bytes = max_bytes
+        self.max_linger = max_linger
+        self._labels = {}
+        self.reset()
+
+    def reset(self):
+        # series key -> (encoded labels, encoded samples), in first-seen order
+        self._series = {}
+        self.count = 0
+        self.size = 0
+        self.opened_at = None
+
+    def __len__(self):
+        return self.count
+
+    def _encoded_labels(self, key, name, labels):
+        encoded = self._labels.get(key)
+        if encoded is None:
+            if len(self._labels) >= MAX_CACHED_SERIES:
+                self._labels.clear()
+            encoded = self._labels[key] = encode_labels(name, labels)
+        return encoded
+
+    def add(self, entry):
+        """Add one entry; returns the batches (zero or one) that had to be flushed first."""
+        name, labels = entry["name"], entry.get("labels") or {}
+        key = (name, tuple(labels.items()))
+        sample = encode_sample(float(entry["value"]), int(entry["timestamp"]))
+        batches = []
+        series = self._series.get(key)
+        cost = len(sample)
+        if series is None:
+            # A new series also costs its labels plus the TimeSeries tag and length.
+            cost += len(self._encoded_labels(key, name, labels)) + 6
+        if self.count and self.size + cost > self.max_bytes:
+            batches.append(self.flush())
+            return batches + self.add(entry)
+        if not self.count:
+            self.opened_at = time.monotonic()
+        if series is None:
+            series = self._series[key] = (self._encoded_labels(key, name, labels), [])
+        series[1].append(sample)
+        self.count += 1
+        self.size += cost
+        return batches
+
+    def time_left(self):
+        if not self.count:
+            return None
+        return max(0.0, self.opened_at + self.max_linger - time.monotonic())
+
+    def flush(self):
+        """Return (body, entry_count) for the current batch and start a new one."""
+        body = b"".join(
+            _delimited(TIMESERIES_TAG, labels + b"".join(samples))
+            for labels, samples in self._series.values()
+        )
+        count = self.count
+        self.reset()
+        return body, count
+
+
+def _fields(data):
+    """Yield (field number, wire type, value) of a protobuf message; raises ValueError when malformed."""
+    position, end = 0, len(data)
+    while position < end:
+        key, position = _read_varint(data, position)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, position = _read_varint(data, position)
+        elif wire_type == 1:
+            value, position = data[position:position + 8], position + 8
+        elif wire_type == 2:
+            length, position = _read_varint(data, position)
+            value, position = data[position:position + length], position + length
+        elif wire_type == 5:
+            value, position = data[position:position + 4], position + 4
+        else:
+            raise ValueError(f"unsupported protobuf wire type {wire_type}")
+        if position > end:
+            raise ValueError("truncated protobuf message")
+        yield number, wire_type, value
+
+
+def _read_varint(data, position):
+    result = shift = 0
+    while True:
+        if position >= len(data):
+            raise ValueError("truncated varint")
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def decode_write_request(body):
+    """Decode an uncompressed WriteRequest into [(labels dict, [(value, timestamp ms)])]."""
+    series = []
+    for number, _, timeseries in _fields(body):
+        if number != 1:
+            continue
+        labels, samples = {}, []
+        for field, _, value in _fields(timeseries):
+            if field == 1:
+                pair = {key: text for key, _, text in _fields(value)}
+                labels[pair.get(1, b"").decode()] = pair.get(2, b"").decode()
+            elif field == 2:
+                sample = {key: raw for key, _, raw in _fields(value)}
+                timestamp = sample.get(2, 0)
+                if timestamp >= 1 << 63:
+                    timestamp -= 1 << 64
+                samples.append((struct.unpack("<d", sample.get(1, bytes(8)))[0], timestamp))
+        series.append((labels, samples))
+    return series
@@ -0,0 +1,136 @@
+"""Retry policy and circuit breaker for ingress requests.
+
+Status codes are split into retryable (throttling and transient server
+errors) and permanent (everything else outside 2xx). Retryable failures are
+retried with capped exponential backoff and full jitter, and a Retry-After
+header sets the minimum wait. Each endpoint has a circuit breaker, so after
+repeated failures or a Retry-After every sender to that endpoint waits
+together instead of each hammering it on its own.
+"""
+import asyncio
+import email.utils
+import random
+import time
+
+# === CONSTANTS ===
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_DELAY_SECONDS = 0.5
+DEFAULT_MAX_DELAY_SECONDS = 60.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_SECONDS = 30.0
+
+SUCCESS = "success"
+RETRYABLE = "retryable"
+PERMANENT = "permanent"
+
+
+def classify(status):
+    """Return SUCCESS, RETRYABLE or PERMANENT for an HTTP status (None = transport error)."""
+    if status is None or status in RETRYABLE_STATUSES:
+        return RETRYABLE
+    if 200 <= status < 300:
+        return SUCCESS
+    return PERMANENT
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """Capped exponential backoff with full jitter."""
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY_SECONDS,
+                 max_delay=DEFAULT_MAX_DELAY_SECONDS):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait after the given zero-based failed attempt."""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            return max(backoff, min(retry_after, self.max_delay))
+        return backoff
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker shared by every sender to one endpoint."""
+
+    _registry = {}
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_seconds=DEFAULT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.open_until = 0.0
+        self._probe = None
+        self._probe_owner = None
+
+    @classmethod
+    def for_endpoint(cls, url, **kwargs):
+        """Return the breaker for url, creating it on first use."""
+        if url not in cls._registry:
+            cls._registry[url] = cls(**kwargs)
+        return cls._registry[url]
+
+    @property
+    def state(self):
+        if self.open_until > time.monotonic():
+            return "open"
+        if self.failures >= self.failure_threshold:
+            return "half-open"
+        return "closed"
+
+    async def wait(self):
+        """Block while the breaker is open; let a single probe through when half-open."""
+        while True:
+            remaining = self.open_until - time.monotonic()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+                continue
+            if self.failures < self.failure_threshold:
+                return
+            if self._probe is None:
+                self._probe = asyncio.get_running_loop().create_future()
+                self._probe_owner = asyncio.current_task()
+                return
+            await asyncio.shield(self._probe)
+
+    def _finish_probe(self):
+        if self._probe is not None:
+            if not self._probe.done():
+                self._probe.set_result(None)
+            self._probe = None
+            self._probe_owner = None
+
+    def release_probe(self):
+        """Let waiters go if the current task took the half-open probe and gave up on it."""
+        if self._probe_owner is asyncio.current_task():
+            self._finish_probe()
+
+    def record_success(self):
+        self.failures = 0
+        self._finish_probe()
+
+    def record_failure(self, retry_after=None):
+        self.failures += 1
+        now = time.monotonic()
+        if retry_after is not None:
+            self.open_until = max(self.open_until, now + retry_after)
+        elif self.failures >= self.failure_threshold and self.open_until <= now:
+            self.open_until = now + self.reset_seconds
+            print(f"Circuit breaker opened for {self.reset_seconds:.0f}s after {self.failures} consecutive failures.")
+        self._finish_probe()
@@ -0,0 +1,124 @@
+"""Stateful metric series: values that carry over from one scrape to the next.
+
+Every (metric, target) pair is a series with its own state, so consecutive
+samples form a plausible time series instead of white noise:
+
+- "gauge": a mean-reverting random walk around the series' level, clamped
+  to a range;
+- "counter": a monotonic total growing at the series' rate.
+
+Seasonal metrics follow the daily and weekly traffic curve of the backfill
+mode. Series are keyed by their target's label values, so a target that
+disappears takes its series with it and a new one starts fresh: counters of a
+replaced pod begin again at zero.
+"""
+import math
+import random
+
+from shipper.backfill import rate_multiplier
+
+# === CONSTANTS ===
+KINDS = ("gauge", "counter")
+DEFAULT_REVERSION_SECONDS = 600
+# Spread of per-series levels around a metric's mean (log-normal sigma).
+LEVEL_SIGMA = 0.4
+# Counters seen on the first scrape start somewhere within this much history.
+WARM_START_SECONDS = 24 * 60 * 60
+
+
+class SeriesSpec:
+    """How one metric behaves.
+
+    For a gauge, mean is the typical level and spread the standard deviation
+    around it; the value reverts to its level with a time constant of
+    reversion_seconds and stays within [low, high]. For a counter, mean is the
+    typical increase per second and spread the relative noise of each
+    increase. Each series draws its own level around mean, so some targets
+    are busier than others. Values are rounded to digits decimals; 0 gives
+    integers.
+    """
+
+    def __init__(self, kind, mean, spread=0.0, low=-math.inf, high=math.inf,
+                 reversion_seconds=DEFAULT_REVERSION_SECONDS, seasonal=False, digits=2):
+        if kind not in KINDS:
+            raise ValueError(f"unknown series kind: {kind}")
+        self.kind = kind
+        self.mean = mean
+        self.spread = spread
+        self.low = low
+        self.high = high
+        self.reversion_seconds = reversion_seconds
+        self.seasonal = seasonal
+        self.digits = digits
+
+    def _clamp(self, value):
+        return min(self.high, max(self.low, value))
+
+    def new_state(self, season, warm):
+        """[value, level] for a new series; warm counters get some history."""
+        level = self.mean * random.lognormvariate(0, LEVEL_SIGMA)
+        if self.kind == "gauge":
+            factor = season if self.seasonal else 1.0
+            return [self._clamp(level * factor + random.gauss(0, self.spread)), level]
+        return [random.uniform(0, level * WARM_START_SECONDS) if warm else 0.0, level]
+
+    def advance(self, state, elapsed, season):
+        """Move a series' state forward by elapsed seconds."""
+        value, level = state
+        factor = season if self.seasonal else 1.0
+        if self.kind == "gauge":
+            target = level * factor
+            decay = math.exp(-elapsed / self.reversion_seconds)
+            noise = random.gauss(0, self.spread * math.sqrt(1 - decay * decay))
+            state[0] = self._clamp(target + (value - target) * decay + noise)
+        else:
+            state[0] = value + level * factor * elapsed * max(0.0, random.gauss(1, self.spread))
+
+    def value(self, state):
+        return round(state[0], self.digits) if self.digits else int(state[0])
+
+
+class SeriesSimulator:
+    """Keeps one state per (metric, target) series and samples them a scrape at a time.
+
+    specs maps metric names to SeriesSpec. Targets are label dicts; their
+    values identify the series, and a target listed twice is sampled once.
+    """
+
+    def __init__(self, specs):
+        self.specs = dict(specs)
+        self._states = {}
+        self._last_timestamp = None
+
+    def __len__(self):
+        return len(self._states)
+
+    def sample(self, targets, timestamp):
+        """One scrape at epoch seconds timestamp.
+
+        Returns {name, value, timestamp (ms), labels} entries, target by
+        target in the order given and metric by metric within a target.
+        Series of targets missing from this scrape are forgotten.
+        """
+        warm = self._last_timestamp is None
+        elapsed = 0.0 if warm else max(0.0, timestamp - self._last_timestamp)
+        self._last_timestamp = timestamp
+        season = rate_multiplier(timestamp)
+        milliseconds = int(timestamp * 1000)
+        previous, states = self._states, {}
+        entries = []
+        for labels in targets:
+            target = tuple(labels.values())
+            for name, spec in self.specs.items():
+                key = (name, target)
+                if key in states:
+                    continue
+                state = previous.get(key)
+                if state is None:
+                    state = spec.new_state(season, warm)
+                else:
+                    spec.advance(state, elapsed, season)
+                states[key] = state
+                entries.append({"name": name, "value": spec.value(state), "timestamp": milliseconds, "labels": labels})
+        self._states = states
+        return entries
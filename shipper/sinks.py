@@ -0,0 +1,231 @@
+"""Destinations for generated entries.
+
+A sink consumes an async iterable of entry chunks, the same chunks accumulate()
+takes, and returns how many entries it wrote:
+
+- EngineSink batches them into request bodies and ships them with a
+  ShippingEngine, or a subclass such as the OTLP/gRPC one;
+- NdjsonSink writes one JSON entry per line, gzipped for .gz paths;
+- ArrowSink writes typed columns to Parquet or Arrow IPC files, one row group
+  per batch of rows. It needs the pyarrow package.
+
+Columnar output is described by a table schema, a list of (column, kind)
+pairs, plus a function turning a chunk into {column: values}. Kinds are
+"string", "dictionary" (dictionary-encoded strings), "int8", "float64",
+"timestamp" (epoch microseconds, UTC), "map" (str -> str dicts) and
+"fixed_binary:N" (bytes of length N).
+"""
+import collections
+import gzip
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from shipper.batching import accumulate
+from shipper.compression import DEFAULT_LEVELS
+from shipper.engine import ShippingEngine
+from shipper.payload import encode_entry
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # Parquet and Arrow output are optional
+    pyarrow = None
+
+# === CONSTANTS ===
+# Path suffix -> file format
+FILE_FORMATS = {
+    ".ndjson": "ndjson",
+    ".ndjson.gz": "ndjson",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+}
+DEFAULT_ROW_GROUP_ROWS = 100_000
+FILE_COMPRESSION = "zstd"
+# Chunks generated ahead of the NDJSON writer thread.
+WRITE_QUEUE_DEPTH = 8
+
+
+def output_format(path):
+    """The file format for path, from its suffix; raises ValueError for unknown suffixes."""
+    for suffix, file_format in FILE_FORMATS.items():
+        if path.endswith(suffix):
+            return file_format
+    raise ValueError(f"unsupported output file {path!r}; use one of {', '.join(FILE_FORMATS)}")
+
+
+def worker_path(path, worker_id):
+    """Per-worker output path: name.ndjson.gz -> name-worker-1.ndjson.gz."""
+    directory, name = os.path.split(path)
+    stem, dot, suffix = name.partition(".")
+    return os.path.join(directory, f"{stem}-worker-{worker_id}{dot}{suffix}")
+
+
+def encoded_entries(chunk):
+    """A chunk's entries as JSON bytes, using its encoded() method when it has one."""
+    if hasattr(chunk, "encoded"):
+        return chunk.encoded()
+    return [encode_entry(entry) for entry in chunk]
+
+
+async def limit_entries(chunks, max_entries):
+    """Pass chunks through until at least max_entries entries have gone by; 0 means no limit."""
+    seen = 0
+    async for chunk in chunks:
+        yield chunk
+        seen += len(chunk)
+        if max_entries and seen >= max_entries:
+            return
+
+
+def _report(label, count, path, started):
+    elapsed = time.monotonic() - started
+    print(f"Wrote {count} {label} to {path} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f}/s).")
+
+
+class EngineSink:
+    """Batches chunks with an accumulator and ships the bodies with engine_class."""
+
+    def __init__(self, url, accumulator, engine_class=ShippingEngine, **engine_options):
+        self.url = url
+        self.accumulator = accumulator
+        self.engine_class = engine_class
+        self.engine_options = engine_options
+
+    async def consume(self, chunks):
+        async with self.engine_class(self.url, **self.engine_options) as engine:
+            await engine.run(accumulate(chunks, self.accumulator))
+        return engine.stats.events_sent
+
+
+class NdjsonSink:
+    """Writes one JSON entry per line; gzip compression runs on a writer thread."""
+
+    def __init__(self, path, label="entries"):
+        self.path = path
+        self.label = label
+
+    def _open(self):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, "wb", compresslevel=DEFAULT_LEVELS["gzip"])
+        return open(self.path, "wb")
+
+    async def consume(self, chunks):
+        started = time.monotonic()
+        count = 0
+        pending = collections.deque()
+        with self._open() as f, ThreadPoolExecutor(max_workers=1) as writer:
+            try:
+                async for chunk in chunks:
+                    encoded = encoded_entries(chunk)
+                    pending.append(writer.submit(f.write, b"\n".join(encoded) + b"\n"))
+                    count += len(encoded)
+                    if len(pending) > WRITE_QUEUE_DEPTH:
+                        pending.popleft().result()
+            finally:
+                for write in pending:
+                    write.result()
+        _report(self.label, count, self.path, started)
+        return count
+
+
+class _DictionaryEncoder:
+    """Stable value -> code mapping, so later batches only append to a column's dictionary.
+
+    Arrow IPC files accept growing dictionaries as deltas but not replacements.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, values):
+        codes = self.codes
+        indices = []
+        for value in values:
+            if value is None:
+                indices.append(None)
+                continue
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values)
+                self.values.append(value)
+            indices.append(code)
+        return pyarrow.DictionaryArray.from_arrays(pyarrow.array(indices, pyarrow.int32()),
+                                                   pyarrow.array(self.values, pyarrow.string()))
+
+
+def arrow_type(kind):
+    """The pyarrow type for a table schema kind."""
+    if kind.startswith("fixed_binary:"):
+        return pyarrow.binary(int(kind.partition(":")[2]))
+    return {
+        "string": pyarrow.string(),
+        "dictionary": pyarrow.dictionary(pyarrow.int32(), pyarrow.string()),
+        "int8": pyarrow.int8(),
+        "float64": pyarrow.float64(),
+        "timestamp": pyarrow.timestamp("us", tz="UTC"),
+        "map": pyarrow.map_(pyarrow.string(), pyarrow.string()),
+    }[kind]
+
+
+class ArrowSink:
+    """Writes chunks as typed columns to a Parquet or Arrow IPC file.
+
+    Rows are buffered until row_group_rows have arrived and then written as
+    one record batch, which becomes one Parquet row group.
+    """
+
+    def __init__(self, path, table_schema, table_columns, file_format="parquet",
+                 row_group_rows=DEFAULT_ROW_GROUP_ROWS, label="entries"):
+        if pyarrow is None:
+            raise RuntimeError("Parquet and Arrow output need the pyarrow package")
+        if file_format not in ("parquet", "arrow"):
+            raise ValueError(f"unsupported columnar format: {file_format}")
+        self.path = path
+        self.table_schema = list(table_schema)
+        self.table_columns = table_columns
+        self.file_format = file_format
+        self.row_group_rows = row_group_rows
+        self.label = label
+        self.schema = pyarrow.schema([(name, arrow_type(kind)) for name, kind in self.table_schema])
+        self._dictionaries = {name: _DictionaryEncoder() for name, kind in self.table_schema if kind == "dictionary"}
+        self._writer = None
+
+    def _open(self):
+        if self.file_format == "parquet":
+            return pyarrow.parquet.ParquetWriter(self.path, self.schema, compression=FILE_COMPRESSION)
+        options = pyarrow.ipc.IpcWriteOptions(compression=FILE_COMPRESSION, emit_dictionary_deltas=True)
+        return pyarrow.ipc.new_file(self.path, self.schema, options=options)
+
+    def _array(self, name, kind, values):
+        if kind == "dictionary":
+            return self._dictionaries[name].encode(values)
+        return pyarrow.array(values, arrow_type(kind))
+
+    def _write(self, buffered):
+        arrays = [self._array(name, kind, buffered[name]) for name, kind in self.table_schema]
+        self._writer.write_batch(pyarrow.record_batch(arrays, schema=self.schema))
+
+    async def consume(self, chunks):
+        started = time.monotonic()
+        count = 0
+        buffered = {name: [] for name, _ in self.table_schema}
+        self._writer = self._open()
+        try:
+            async for chunk in chunks:
+                for name, values in self.table_columns(chunk).items():
+                    buffered[name].extend(values)
+                count += len(chunk)
+                if len(buffered[self.table_schema[0][0]]) >= self.row_group_rows:
+                    self._write(buffered)
+                    buffered = {name: [] for name, _ in self.table_schema}
+        finally:
+            # Also on cancellation, so the file gets its footer.
+            if buffered[self.table_schema[0][0]]:
+                self._write(buffered)
+            self._writer.close()
+            self._writer = None
+        _report(self.label, count, self.path, started)
+        return count
@@ -0,0 +1,204 @@
+"""Write-ahead spool for batches that have not been acknowledged yet.
+
+Every batch is appended to the active segment file before it is sent and
+acknowledged once ingress accepts it. A segment whose records are all
+acknowledged is deleted. Records that failed, or that were still unacknowledged
+when the process stopped, are kept on disk and handed to the replayer. Only
+their (segment, offset) ids live in memory.
+
+Segment layout: a sequence of records, each a little-endian header of
+(body length, crc32 of body, event count) followed by the body. Acknowledged
+offsets go to a sibling ".acks" file as little-endian u64 values.
+"""
+import collections
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+
+# === CONSTANTS ===
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+RECORD_HEADER = struct.Struct("<III")
+ACK_ENTRY = struct.Struct("<Q")
+SEGMENT_GLOB = "segment-*.log"
+
+
+class Segment:
+    """One append-only segment file plus its acknowledgement log."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.seq = int(self.path.stem.split("-")[1])
+        self.ack_path = self.path.with_suffix(".acks")
+        self.pending = set()
+        self.size = self.path.stat().st_size if self.path.exists() else 0
+        self._writer = None
+        self._acks = None
+        self._map = None
+
+    def open_for_append(self):
+        self._writer = open(self.path, "ab")
+
+    def append(self, body, count, fsync=False):
+        offset = self.size
+        self._writer.write(RECORD_HEADER.pack(len(body), zlib.crc32(body), count))
+        self._writer.write(body)
+        self._writer.flush()
+        if fsync:
+            os.fsync(self._writer.fileno())
+        self.size += RECORD_HEADER.size + len(body)
+        self.pending.add(offset)
+        return offset
+
+    def ack(self, offset, fsync=False):
+        if self._acks is None:
+            self._acks = open(self.ack_path, "ab")
+        self._acks.write(ACK_ENTRY.pack(offset))
+        self._acks.flush()
+        if fsync:
+            os.fsync(self._acks.fileno())
+        self.pending.discard(offset)
+
+    def _mapped(self, end):
+        if self._map is None or len(self._map) < end:
+            if self._map is not None:
+                self._map.close()
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def read(self, offset):
+        """Return (body, count) for the record at offset."""
+        data = self._mapped(offset + RECORD_HEADER.size)
+        length, _, count = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        data = self._mapped(start + length)
+        return bytes(data[start:start + length]), count
+
+    def recover(self):
+        """Rebuild pending offsets from disk, truncating a torn tail record."""
+        acked = set()
+        if self.ack_path.exists():
+            raw = self.ack_path.read_bytes()
+            usable = len(raw) - len(raw) % ACK_ENTRY.size
+            acked = {entry[0] for entry in ACK_ENTRY.iter_unpack(raw[:usable])}
+        if self.size == 0:
+            return
+        data = self._mapped(self.size)
+        offset = 0
+        while offset + RECORD_HEADER.size <= self.size:
+            length, crc, _ = RECORD_HEADER.unpack_from(data, offset)
+            end = offset + RECORD_HEADER.size + length
+            if end > self.size or zlib.crc32(data[offset + RECORD_HEADER.size:end]) != crc:
+                break
+            if offset not in acked:
+                self.pending.add(offset)
+            offset = end
+        if offset != self.size:
+            print(f"Spool segment {self.path.name} has a torn record at {offset}; truncating.")
+            self._map.close()
+            self._map = None
+            os.truncate(self.path, offset)
+            self.size = offset
+
+    def close(self):
+        for handle in (self._writer, self._acks, self._map):
+            if handle is not None:
+                handle.close()
+        self._writer = self._acks = self._map = None
+
+    def remove(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self.ack_path.unlink(missing_ok=True)
+
+
+class Spool:
+    """Segmented on-disk queue of batches awaiting a 2xx from ingress.
+
+    append() returns a record id; the sender then calls ack() on success or
+    release() on failure, which queues the id for replay.
+    """
+
+    def __init__(self, directory, segment_bytes=DEFAULT_SEGMENT_BYTES, fsync=False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.segments = {}
+        self.backlog = collections.deque()
+        self._recover()
+        next_seq = max(self.segments, default=0) + 1
+        self._active = self._new_segment(next_seq)
+
+    def _recover(self):
+        for path in sorted(self.directory.glob(SEGMENT_GLOB)):
+            segment = Segment(path)
+            segment.recover()
+            if not segment.pending:
+                segment.remove()
+                continue
+            self.segments[segment.seq] = segment
+            self.backlog.extend((segment.seq, offset) for offset in sorted(segment.pending))
+        if self.backlog:
+            print(f"Recovered {len(self.backlog)} unacknowledged batches from {self.directory}.")
+
+    def _new_segment(self, seq):
+        segment = Segment(self.directory / f"segment-{seq:012d}.log")
+        segment.open_for_append()
+        self.segments[seq] = segment
+        return segment
+
+    @property
+    def backlog_size(self):
+        return len(self.backlog)
+
+    @property
+    def pending_count(self):
+        return sum(len(segment.pending) for segment in self.segments.values())
+
+    def append(self, body, count):
+        """Persist a batch before it is sent and return its record id."""
+        if self._active.size >= self.segment_bytes:
+            previous = self._active
+            self._active = self._new_segment(previous.seq + 1)
+            self._retire_if_done(previous)
+        offset = self._active.append(body, count, self.fsync)
+        return self._active.seq, offset
+
+    def ack(self, record_id):
+        """Mark a record delivered; drops its segment once nothing is pending."""
+        seq, offset = record_id
+        segment = self.segments.get(seq)
+        if segment is None:
+            return
+        segment.ack(offset, self.fsync)
+        self._retire_if_done(segment)
+
+    def release(self, record_id):
+        """Queue a record whose delivery failed for replay."""
+        self.backlog.append(record_id)
+
+    def next_backlog(self):
+        """Pop the oldest record id waiting for replay, or None."""
+        while self.backlog:
+            record_id = self.backlog.popleft()
+            segment = self.segments.get(record_id[0])
+            if segment is not None and record_id[1] in segment.pending:
+                return record_id
+        return None
+
+    def read(self, record_id):
+        """Return (body, count) for a record id."""
+        seq, offset = record_id
+        return self.segments[seq].read(offset)
+
+    def _retire_if_done(self, segment):
+        if segment is not self._active and not segment.pending:
+            segment.remove()
+            del self.segments[segment.seq]
+
+    def close(self):
+        for segment in self.segments.values():
+            segment.close()
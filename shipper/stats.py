@@ -0,0 +1,108 @@
+"""Counters and latency histograms kept by the shipping engine.
+
+Snapshots are plain dicts so they can cross process boundaries and be merged
+by the --workers parent.
+"""
+import bisect
+import time
+
+# === CONSTANTS ===
+# Upper bounds, in seconds, of the send latency buckets; the last bucket is +Inf.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNTER_FIELDS = ("batches_sent", "events_sent", "bytes_sent", "wire_bytes_sent", "errors", "retries", "dropped")
+# Point-in-time values the engine fills in before each snapshot.
+GAUGE_FIELDS = ("queued", "in_flight", "spool_backlog", "spool_pending")
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram; counts from several histograms can be summed."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS, counts=None):
+        self.bounds = tuple(bounds)
+        self.counts = list(counts) if counts is not None else [0] * (len(self.bounds) + 1)
+        self.total = sum(self.counts)
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+
+    def merge(self, counts, total_seconds=0.0):
+        for i, count in enumerate(counts):
+            self.counts[i] += count
+        self.total += sum(counts)
+        self.sum += total_seconds
+
+    def quantile(self, q):
+        """Estimate the q-quantile by interpolating inside its bucket."""
+        if not self.total:
+            return 0.0
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+
+class ShipperStats:
+    """Running counters for one engine."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.batches_sent = 0
+        self.events_sent = 0
+        # Uncompressed body bytes and bytes actually put on the wire.
+        self.bytes_sent = 0
+        self.wire_bytes_sent = 0
+        self.errors = 0
+        self.retries = 0
+        self.dropped = 0
+        # Batches waiting for the rate limiter or a free slot, and requests being sent.
+        self.queued = 0
+        self.in_flight = 0
+        # Spooled batches waiting for replay, and all unacknowledged spooled batches.
+        self.spool_backlog = 0
+        self.spool_pending = 0
+        self.latency = LatencyHistogram()
+
+    def snapshot(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        snapshot = {field: getattr(self, field) for field in COUNTER_FIELDS + GAUGE_FIELDS}
+        snapshot.update({
+            "compression_ratio": self.bytes_sent / self.wire_bytes_sent if self.wire_bytes_sent else 1.0,
+            "elapsed_seconds": elapsed,
+            "batches_per_second": self.batches_sent / elapsed,
+            "events_per_second": self.events_sent / elapsed,
+            "bytes_per_second": self.bytes_sent / elapsed,
+            "latency_p50": self.latency.quantile(0.50),
+            "latency_p99": self.latency.quantile(0.99),
+            "latency_buckets": list(self.latency.counts),
+            "latency_sum": self.latency.sum,
+        })
+        return snapshot
+
+
+def merge_snapshots(snapshots):
+    """Combine per-worker snapshots into one: counters, gauges and rates add up."""
+    merged = {field: sum(s[field] for s in snapshots) for field in COUNTER_FIELDS + GAUGE_FIELDS}
+    latency = LatencyHistogram()
+    for s in snapshots:
+        latency.merge(s["latency_buckets"], s["latency_sum"])
+    merged.update({
+        "workers": len(snapshots),
+        "compression_ratio": merged["bytes_sent"] / merged["wire_bytes_sent"] if merged["wire_bytes_sent"] else 1.0,
+        "elapsed_seconds": max((s["elapsed_seconds"] for s in snapshots), default=0.0),
+        "batches_per_second": sum(s["batches_per_second"] for s in snapshots),
+        "events_per_second": sum(s["events_per_second"] for s in snapshots),
+        "bytes_per_second": sum(s["bytes_per_second"] for s in snapshots),
+        "latency_p50": latency.quantile(0.50),
+        "latency_p99": latency.quantile(0.99),
+        "latency_buckets": latency.counts,
+        "latency_sum": latency.sum,
+    })
+    return merged
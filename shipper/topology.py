@@ -0,0 +1,92 @@
+"""Kubernetes-like cluster topology for the metrics generator.
+
+Namespaces hold deployments, deployments hold replica pods, and every pod
+runs on a node. The pods' label sets are the scrape targets: one list in a
+stable order (namespace, deployment, replica) with unique pod names. Churn
+replaces replicas in place, so a new pod takes its predecessor's position and
+the order stays stable from one scrape to the next. With shards > 1 a
+topology holds only every shards-th pod, so workers split one cluster.
+"""
+import random
+
+# === CONSTANTS ===
+# Characters Kubernetes uses for generated name suffixes.
+POD_SUFFIX_CHARACTERS = "bcdfghjklmnpqrstvwxz2456789"
+POD_SUFFIX_LENGTH = 5
+
+
+def _names(count, given, prefix):
+    """count names: the given ones first, then prefix-N."""
+    names = list(given[:count])
+    names.extend(f"{prefix}-{i}" for i in range(len(names) + 1, count + 1))
+    return names
+
+
+class Topology:
+    """Nodes, namespaces, deployments and pods, sized by the four counts.
+
+    Deployments are spread round-robin over the namespaces and pods as evenly
+    as possible over the deployments. labels are added to every target;
+    namespace_names and deployment_names are used before numbered names.
+    Only the pods at positions shard, shard + shards, ... become targets.
+    """
+
+    def __init__(self, nodes, namespaces, deployments, pods, labels=None, namespace_names=(), deployment_names=(),
+                 shard=0, shards=1):
+        if not 1 <= namespaces <= deployments <= pods or nodes < 1:
+            raise ValueError("need at least one node and 1 <= namespaces <= deployments <= pods")
+        self.nodes = [f"node-{i}" for i in range(1, nodes + 1)]
+        self.labels = dict(labels or {})
+        self._live = set()
+        namespace_list = _names(namespaces, list(namespace_names), "namespace")
+        # Deployment numbers per namespace; the first pods % deployments get one replica more.
+        owned = {namespace: [] for namespace in namespace_list}
+        for index in range(deployments):
+            owned[namespace_list[index % namespaces]].append(index)
+        replicas, extra = divmod(pods, deployments)
+        # Each target's (namespace, deployment), in target order.
+        self._slots = []
+        for namespace, indices in owned.items():
+            names = _names(len(indices), list(deployment_names), "deployment")
+            for name, index in zip(names, indices):
+                self._slots.extend([(namespace, name)] * (replicas + (index < extra)))
+        self._slots = self._slots[shard::shards]
+        self.targets = [self._new_pod(namespace, deployment) for namespace, deployment in self._slots]
+
+    def __len__(self):
+        return len(self.targets)
+
+    def _new_pod(self, namespace, deployment):
+        while True:
+            suffix = "".join(random.choices(POD_SUFFIX_CHARACTERS, k=POD_SUFFIX_LENGTH))
+            pod = f"{deployment}-{suffix}"
+            if (namespace, pod) not in self._live:
+                break
+        self._live.add((namespace, pod))
+        return {"namespace": namespace, "pod": pod, "node": random.choice(self.nodes), **self.labels}
+
+    def churn(self, probability):
+        """Replace each pod with the given probability by a new replica on any node; returns the count replaced."""
+        if probability <= 0:
+            return 0
+        replaced = 0
+        for i, (namespace, deployment) in enumerate(self._slots):
+            if random.random() < probability:
+                self._live.discard((namespace, self.targets[i]["pod"]))
+                self.targets[i] = self._new_pod(namespace, deployment)
+                replaced += 1
+        return replaced
+
+
+def add_topology_arguments(parser, nodes, namespaces, deployments, pods):
+    """Add the cluster size and churn options to a sender's ArgumentParser."""
+    parser.add_argument("--nodes", type=int, default=nodes,
+                        help="nodes the pods are spread over (default: %(default)s)")
+    parser.add_argument("--namespaces", type=int, default=namespaces,
+                        help="namespaces (default: %(default)s)")
+    parser.add_argument("--deployments", type=int, default=deployments,
+                        help="deployments, spread over the namespaces (default: %(default)s)")
+    parser.add_argument("--pods", type=int, default=pods,
+                        help="pods, spread over the deployments as replicas (default: %(default)s)")
+    parser.add_argument("--churn", type=float, default=0.0,
+                        help="probability per scrape that a pod is replaced by a new replica (default: %(default)s)")
@@ -0,0 +1,155 @@
+"""Multi-process sharded load mode (--workers N).
+
+Each worker process runs its own generator and ShippingEngine with its own
+RNG seed, spool directory and 1/N share of the rate limits. Workers report
+stats snapshots to the parent over a queue, and the parent prints totals
+across all workers and serves them with --metrics-port.
+"""
+import asyncio
+import copy
+import multiprocessing
+import os
+import queue
+import random
+import signal
+import time
+
+from shipper.exporter import MetricsExporter
+from shipper.stats import merge_snapshots
+
+# === CONSTANTS ===
+PARENT_REPORT_SECONDS = 5.0
+SHUTDOWN_GRACE_SECONDS = 10.0
+# Arguments that hold a global budget to be split evenly across workers.
+SHARED_RATE_ARGS = ("bytes_per_second", "events_per_second", "daily_bytes")
+
+
+def worker_args(args, index):
+    """Return a copy of args with worker index's seed, spool directory, rate share and entry share."""
+    shard = copy.copy(args)
+    shard.worker_id = index
+    shard.seed = args.seed + index
+    for name in SHARED_RATE_ARGS:
+        value = getattr(args, name, 0)
+        if value:
+            setattr(shard, name, value / args.workers)
+    if getattr(args, "max_entries", 0):
+        # Whole entries; the first max_entries % workers workers take one more.
+        share, extra = divmod(args.max_entries, args.workers)
+        shard.max_entries = share + (index < extra)
+    if args.spool_dir:
+        shard.spool_dir = os.path.join(args.spool_dir, f"worker-{index}")
+    return shard
+
+
+async def _run_until_terminated(run, args):
+    """Run run(args), turning SIGTERM into a cancellation so the engine can flush."""
+    task = asyncio.current_task()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    try:
+        await run(args)
+    except asyncio.CancelledError:
+        pass
+
+
+def _worker_main(run, args, stats_queue):
+    # The parent owns Ctrl-C and stops workers with SIGTERM.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    random.seed(args.seed)
+    args.stats_reporter = lambda snapshot: stats_queue.put((args.worker_id, snapshot))
+    asyncio.run(_run_until_terminated(run, args))
+
+
+def _print_totals(latest, final=False):
+    totals = merge_snapshots(list(latest.values()))
+    prefix = "Final" if final else "Total"
+    print(f"[{prefix}] workers={totals['workers']} "
+          f"events/s={totals['events_per_second']:.0f} "
+          f"bytes/s={totals['bytes_per_second']:.0f} "
+          f"batches={totals['batches_sent']} errors={totals['errors']} "
+          f"retries={totals['retries']} dropped={totals['dropped']} "
+          f"p50={totals['latency_p50'] * 1000:.1f}ms p99={totals['latency_p99'] * 1000:.1f}ms")
+    if final:
+        for worker_id in sorted(latest):
+            snapshot = latest[worker_id]
+            print(f"  worker {worker_id}: events/s={snapshot['events_per_second']:.0f} "
+                  f"errors={snapshot['errors']} p99={snapshot['latency_p99'] * 1000:.1f}ms")
+    return totals
+
+
+def _start_exporter(args):
+    if not getattr(args, "metrics_port", 0):
+        return None
+    exporter = MetricsExporter(args.metrics_port, args.metrics_host)
+    port = exporter.start()
+    print(f"Serving shipper metrics on http://{args.metrics_host}:{port}/metrics")
+    return exporter
+
+
+def run_workers(run, args):
+    """Run the coroutine function run(args) in args.workers processes, or inline for one."""
+    if args.seed is None:
+        args.seed = int.from_bytes(os.urandom(4), "little")
+    if args.workers <= 1:
+        random.seed(args.seed)
+        exporter = _start_exporter(args)
+        if exporter is not None:
+            args.stats_reporter = exporter.update
+        try:
+            asyncio.run(run(args))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if exporter is not None:
+                exporter.close()
+        return None
+
+    if 0 < getattr(args, "max_entries", 0) < args.workers:
+        # A worker with a share of 0 would run without a limit.
+        raise SystemExit("--max-entries must be at least --workers.")
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+    stats_queue = context.Queue()
+    processes = [
+        context.Process(target=_worker_main, args=(run, worker_args(args, index), stats_queue), daemon=True)
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    print(f"Started {args.workers} workers (base seed {args.seed}).")
+    # Only now, so forked workers do not inherit the exporter's thread and socket.
+    exporter = _start_exporter(args)
+
+    latest = {}
+    next_report = time.monotonic() + PARENT_REPORT_SECONDS
+    try:
+        while _collect(processes, stats_queue, latest):
+            if latest and exporter is not None:
+                exporter.update(merge_snapshots(list(latest.values())))
+            if latest and time.monotonic() >= next_report:
+                _print_totals(latest)
+                next_report = time.monotonic() + PARENT_REPORT_SECONDS
+    except KeyboardInterrupt:
+        print("Stopping workers...")
+        for process in processes:
+            process.terminate()
+        deadline = time.monotonic() + SHUTDOWN_GRACE_SECONDS
+        while time.monotonic() < deadline and _collect(processes, stats_queue, latest):
+            pass
+    for process in processes:
+        if process.is_alive():
+            process.kill()
+        process.join()
+    if exporter is not None:
+        exporter.close()
+    return _print_totals(latest, final=True) if latest else None
+
+
+def _collect(processes, stats_queue, latest):
+    """Read one snapshot into latest; returns False once every worker is done."""
+    try:
+        worker_id, snapshot = stats_queue.get(timeout=0.5)
+        latest[worker_id] = snapshot
+        return True
+    except queue.Empty:
+        return any(process.is_alive() for process in processes)